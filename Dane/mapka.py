@@ -1,29 +1,87 @@
+import os
 import folium
+import numpy as np
+import shapely
+from branca.colormap import LinearColormap
+from folium.plugins import FastMarkerCluster
+from shapely.geometry import shape, mapping
+from metrics import timed
+from mapka import simplify_tolerance
 
-def map_creator(analysis_mgr):
-    counties_data = list(analysis_mgr.mongo.db.powiaty.find({}, {'_id': 0}))
+STATION_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 5, color: 'red', fill: true});
+    marker.bindPopup('Stacja ID: ' + row[2]);
+    return marker;
+}"""
 
-    m = folium.Map(location=[52.0, 19.0], zoom_start=6)
+def simplify_counties(counties, zoom, precision=4):
+    geoms = [shape(c['geometry']) for c in counties]
+    tolerance = simplify_tolerance(zoom)
+
+    # coverage_simplify upraszcza wspolna granice raz dla obu powiatow, wiec nie robia sie szczeliny
+    if hasattr(shapely, 'coverage_simplify'):
+        simplified = shapely.coverage_simplify(geoms, tolerance)
+    else:
+        simplified = shapely.simplify(geoms, tolerance, preserve_topology=True)
+    simplified = shapely.transform(simplified, lambda coords: np.round(coords, precision))
+
+    return [{'type': 'Feature',
+             'properties': {'name': c['properties'].get('name'), 'id': c['properties'].get('id')},
+             'geometry': mapping(g)} for c, g in zip(counties, simplified)]
+
+@timed('map.map_creator')
+def map_creator(analysis_mgr, county_results=None, zoom_start=6, output='Wizualizacja.html'):
+    counties_data = list(analysis_mgr.mongo.db.powiaty.find({}, {'_id': 0, 'geometry': 1, 'properties.name': 1, 'properties.id': 1}))
+
+    m = folium.Map(location=[52.0, 19.0], zoom_start=zoom_start, prefer_canvas=True)
 
     if counties_data:
-        folium.GeoJson(
-            {'type': 'FeatureCollection', 'features': counties_data},
-            style_function=lambda x: {'fillColor': 'green', 'color': 'black', 'weight': 1, 'fillOpacity': 0.1},
-            name="Powiaty").add_to(m)
+        features = simplify_counties(counties_data, zoom_start)
+
+        if county_results is not None:
+            # kartogram roznicy dzien-noc z wynikow batch.county_summary
+            diffs = {str(row.county_id): row.difference for row in county_results.itertuples()}
+            for f in features:
+                diff = diffs.get(str(f['properties']['id']))
+                f['properties']['difference'] = round(float(diff), 2) if diff is not None and not np.isnan(diff) else None
 
+            values = [f['properties']['difference'] for f in features if f['properties']['difference'] is not None]
+            colormap = LinearColormap(['#2c7bb6', '#ffffbf', '#d7191c'],
+                                      vmin=min(values, default=0), vmax=max(values, default=1),
+                                      caption='Różnica dzień - noc [°C]')
+
+            def style(x):
+                diff = x['properties']['difference']
+                return {'fillColor': colormap(diff) if diff is not None else 'lightgray',
+                        'color': 'black', 'weight': 0.5, 'fillOpacity': 0.7}
+
+            folium.GeoJson(
+                {'type': 'FeatureCollection', 'features': features},
+                style_function=style,
+                tooltip=folium.GeoJsonTooltip(fields=['name', 'difference'], aliases=['Powiat', 'Różnica [°C]']),
+                name="Powiaty").add_to(m)
+            colormap.add_to(m)
+        else:
+            folium.GeoJson(
+                {'type': 'FeatureCollection', 'features': features},
+                style_function=lambda x: {'fillColor': 'green', 'color': 'black', 'weight': 1, 'fillOpacity': 0.1},
+                name="Powiaty").add_to(m)
+
+    # wszystkie pozycje jednym GEOPOS zamiast zapytania na stacje
     stations_in_redis = analysis_mgr.redis.db.zrange('station_points', 0, -1)
+    positions = analysis_mgr.redis.db.geopos('station_points', *stations_in_redis) if stations_in_redis else []
 
-    for s_id in stations_in_redis:
+    points = []
+    for s_id, pos in zip(stations_in_redis, positions):
         s_id_str = s_id.decode('utf-8') if isinstance(s_id, bytes) else str(s_id)
-        pos = analysis_mgr.redis.db.geopos('station_points', s_id_str)
-
-        if pos and pos[0]:
-            lon, lat = pos[0]
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=5,
-                color='red',
-                fill=True,
-                popup=f'Stacja ID: {s_id_str}').add_to(m)
-
-    m.save('Wizualizacja.html')
\ No newline at end of file
+        if pos:
+            lon, lat = pos
+            points.append([round(lat, 5), round(lon, 5), s_id_str])
+
+    FastMarkerCluster(points, callback=STATION_CALLBACK, name='Stacje').add_to(m)
+
+    m.save(output)
+    size = os.path.getsize(output)
+    print(f'Mapa zapisana: {len(features) if counties_data else 0} powiatów, {len(points)} stacji, {size / 2 ** 20:.2f} MB')
+    return output
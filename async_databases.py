@@ -0,0 +1,212 @@
+import sys
+import json
+import time
+import asyncio
+import numpy as np
+import redis.asyncio as aioredis
+from motor.motor_asyncio import AsyncIOMotorClient
+from databases import (MEASUREMENT_COLUMNS, ROLLUP_FIELDS, ROLLUP_KEY, STATION_FORMATS, county_key, daily_day_night,
+                       measurement_columns, normalize_m_types, split_m_types, station_results, station_totals)
+from solar import DAY_VARIANTS, DEFAULT_VARIANT, SolarTable
+
+# tryb aggregate zapisuje najpierw tabele slonca, wiec nie da sie go zrownoleglic z pobraniem stacji
+ASYNC_MODES = ('python', 'rollup')
+
+
+class AsyncMongoManager:
+    def __init__(self, host="mongodb://localhost:27017/", database='projekt2', client=None):
+        self.client = client if client is not None else AsyncIOMotorClient(host)
+        self.db = self.client[database]
+
+    async def find_county(self, county_name):
+        return await self.db.powiaty.find_one({'properties.name': county_name})
+
+    async def get_counties(self):
+        return await self.db.powiaty.find({}, {'properties.name': 1, 'properties.id': 1, '_id': 0}).to_list(None)
+
+    async def get_measurement_columns(self, station_ids, start_date, end_date, m_types):
+        cursor = self.db.stacje.aggregate([
+            {'$match': {'station_id': {'$in': list(station_ids)}, 'm_type': {'$in': list(m_types)},
+                        'date': {'$gte': start_date, '$lte': end_date}}},
+            {'$project': MEASUREMENT_COLUMNS}
+        ])
+        return measurement_columns(await cursor.to_list(None), with_m_type=True)
+
+    async def get_rollups(self, station_ids, start_date, end_date, m_types):
+        cursor = self.db.dobowe.find(
+            {'station_id': {'$in': list(station_ids)}, 'm_type': {'$in': list(m_types)},
+             'date': {'$gte': start_date, '$lte': end_date}},
+            {'_id': 0, 'station_id': 1, 'm_type': 1, 'day_sum': 1, 'day_count': 1, 'night_sum': 1, 'night_count': 1}
+        ).sort(ROLLUP_KEY)
+        docs = await cursor.to_list(None)
+        daily = {field: np.array([d[field] for d in docs], dtype=dtype) for field, dtype in ROLLUP_FIELDS}
+        daily['m_type'] = np.array([d['m_type'] for d in docs], dtype=object)
+        return daily
+
+    async def get_station_ids(self):
+        return await self.db.stacje.distinct('station_id')
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncRedisManager:
+    def __init__(self, host='localhost', port=6379, **pool_kwargs):
+        self.pool = aioredis.ConnectionPool(host=host, port=port, db=0, decode_responses=True, **pool_kwargs)
+        self.db = aioredis.Redis(connection_pool=self.pool)
+        self.raw_pool = aioredis.ConnectionPool(host=host, port=port, db=0, **pool_kwargs)
+        self.raw = aioredis.Redis(connection_pool=self.raw_pool)
+
+    async def get_stations(self, s_ids):
+        if not s_ids:
+            return []
+
+        keys = [f'station:{s_id}' for s_id in s_ids]
+        storage = await self.db.get('station_format') or 'json'
+        if storage not in STATION_FORMATS:
+            raise ValueError(f'Redis // Unknown station storage format: {storage}.')
+
+        if storage == 'json':
+            return [json.loads(d) for d in await self.db.mget(keys) if d]
+
+        if storage == 'msgpack':
+            import msgpack
+            return [msgpack.unpackb(d) for d in await self.raw.mget(keys) if d]
+
+        pipe = self.db.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+
+        stations = []
+        for fields in await pipe.execute():
+            if fields:
+                geometry = json.loads(fields.pop('_geometry'))
+                props = {k: json.loads(v) for k, v in fields.items()}
+                stations.append({'type': 'Feature', 'properties': props, 'geometry': geometry})
+        return stations
+
+    async def get_county_station_ids(self, county_id):
+        return sorted(int(s_id) for s_id in await self.db.smembers(f'county:{county_key(county_id)}:stations'))
+
+    async def get_county_stations(self, county_id):
+        return await self.get_stations(await self.get_county_station_ids(county_id))
+
+    async def get_county_station_counts(self):
+        return {c: int(n) for c, n in (await self.db.hgetall('county_station_counts')).items()}
+
+    async def update_county_counts(self, station_ids=None):
+        county_ids = list(await self.db.smembers('counties'))
+
+        pipe = self.db.pipeline(transaction=False)
+        for c in county_ids:
+            pipe.smembers(f'county:{c}:stations')
+        members = await pipe.execute()
+
+        measured = None if station_ids is None else {str(s_id) for s_id in station_ids}
+        counts = {c: len(m if measured is None else m & measured) for c, m in zip(county_ids, members)}
+
+        await self.db.delete('county_station_counts')
+        if counts:
+            await self.db.hset('county_station_counts', mapping=counts)
+        return counts
+
+    async def stations_within_radius(self, lon, lat, radius_km):
+        s_ids = await self.db.geosearch('station_points', longitude=lon, latitude=lat, radius=radius_km, unit='km')
+        return await self.get_stations(sorted(s_ids, key=int))
+
+    async def get_data_version(self):
+        return await self.db.get('data_version') or '0'
+
+    async def close(self):
+        for client in (self.db, self.raw):
+            await (client.aclose() if hasattr(client, 'aclose') else client.close())
+
+
+async def get_counties_with_station_count_async(mongo_mgr, redis_mgr):
+    # powiaty z Mongo i liczniki z Redisa pobierane jednoczesnie
+    counties, counts = await asyncio.gather(mongo_mgr.get_counties(), redis_mgr.get_county_station_counts())
+    if not counts:
+        counts = await redis_mgr.update_county_counts(await mongo_mgr.get_station_ids())
+
+    county_id_to_name = {}
+    for county in counties:
+        county_name = county.get('properties', {}).get('name')
+        county_id = county.get('properties', {}).get('id')
+        if county_name and county_key(county_id):
+            county_id_to_name[county_key(county_id)] = county_name
+
+    county_counts = {name: 0 for name in county_id_to_name.values()}
+    for county_id, county_name in county_id_to_name.items():
+        county_counts[county_name] += counts.get(county_id, 0)
+    return county_counts
+
+
+async def analyze_county_day_night_async(mongo_mgr, redis_mgr, county_name, start_date, end_date, mode='python',
+                                         m_types=None, variant=DEFAULT_VARIANT):
+    if mode not in ASYNC_MODES:
+        raise ValueError(f'Analysis // Async analysis supports modes {", ".join(ASYNC_MODES)}, not {mode}.')
+    if variant not in DAY_VARIANTS:
+        raise ValueError(f'Analysis // Unknown day variant: {variant}.')
+    if mode == 'rollup' and variant != DEFAULT_VARIANT:
+        raise ValueError(f"Analysis // Rollups use the '{DEFAULT_VARIANT}' variant; use 'python' for {variant}.")
+
+    m_types = normalize_m_types(m_types)
+    county = await mongo_mgr.find_county(county_name)
+    s_ids = await redis_mgr.get_county_station_ids(county['properties']['id'])
+
+    # dokumenty stacji z Redisa i pomiary z Mongo potrzebuja tylko listy id, wiec ida rownolegle
+    if mode == 'rollup':
+        stations, daily = await asyncio.gather(redis_mgr.get_stations(s_ids),
+                                               mongo_mgr.get_rollups(s_ids, start_date, end_date, m_types))
+        m_type = daily.pop('m_type')
+        sums = {t: station_totals(dict(zip(daily, columns)))
+                for t, columns in split_m_types(m_type, *daily.values(), m_types=m_types)}
+    else:
+        stations, columns = await asyncio.gather(redis_mgr.get_stations(s_ids),
+                                                 mongo_mgr.get_measurement_columns(s_ids, start_date, end_date, m_types))
+        sums = await asyncio.to_thread(_python_sums, stations, *columns, m_types=m_types, variant=variant)
+
+    return {
+        'county': county['properties'],
+        'county_geometry': county['geometry'],
+        'date_range': {'start': start_date, 'end': end_date},
+        'stations': station_results(stations, sums, m_types)
+    }
+
+
+def _python_sums(stations, s_ids, dates, minutes, values, m_type, m_types, variant=DEFAULT_VARIANT):
+    positions = {s['properties']['ifcid']: s['geometry']['coordinates'] for s in stations}
+    # pomiary stacji bez dokumentu w Redisie pomijane, jak w wersji synchronicznej
+    known = np.isin(s_ids, list(positions))
+    s_ids, dates, minutes, values, m_type = s_ids[known], dates[known], minutes[known], values[known], m_type[known]
+    table = SolarTable(positions, dates, variant)
+    return {t: station_totals(daily_day_night(table, *columns))
+            for t, columns in split_m_types(m_type, s_ids, dates, minutes, values, m_types=m_types)}
+
+
+async def analyze_counties_async(mongo_mgr, redis_mgr, county_names, start_date, end_date, mode='python', concurrency=8,
+                                 m_types=None, variant=DEFAULT_VARIANT):
+    # wiele powiatow naraz, ale najwyzej concurrency zapytan w locie
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(name):
+        async with semaphore:
+            return name, await analyze_county_day_night_async(mongo_mgr, redis_mgr, name, start_date, end_date, mode,
+                                                              m_types, variant)
+
+    return dict(await asyncio.gather(*(analyze(name) for name in county_names)))
+
+
+async def _main(county_name, start_date, end_date, mode='python'):
+    mongo, redis = AsyncMongoManager(), AsyncRedisManager()
+    try:
+        start = time.perf_counter()
+        result = await analyze_county_day_night_async(mongo, redis, county_name, start_date, end_date, mode)
+        print(f"Analysis // {county_name}: {len(result['stations'])} stations in {time.perf_counter() - start:.3f}s.")
+    finally:
+        await redis.close()
+        mongo.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(*(sys.argv[1:4] or ('tarnogórski', '2025-09-01', '2025-09-10'))))
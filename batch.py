@@ -0,0 +1,100 @@
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from databases import MongoManager, RedisManager, analyze_stations_day_night, county_key, get_date_range
+
+# polaczenia sa per proces - klienci pymongo/redis nie moga byc dzieleni miedzy procesami
+_mongo = None
+_redis = None
+
+
+def _init_worker():
+    global _mongo, _redis
+    _mongo = MongoManager(check_plans=False)
+    _redis = RedisManager()
+
+
+def _analyze_county(county_id, county_name, start_date, end_date, mode):
+    start = time.perf_counter()
+    stations = _redis.get_county_stations(county_id)
+    results = analyze_stations_day_night(_mongo, stations, start_date, end_date, mode)
+
+    rows = [{
+        'county_id': county_id,
+        'county': county_name,
+        'station_id': s['station_id'],
+        'name': s['name'],
+        'lon': s['geometry']['lon'],
+        'lat': s['geometry']['lat'],
+        'avg_temp_day': s['analysis']['avg_temp_day'],
+        'avg_temp_night': s['analysis']['avg_temp_night'],
+        'day_measurements': s['analysis']['day_measurements'],
+        'night_measurements': s['analysis']['night_measurements']
+    } for s in results]
+
+    return county_id, county_name, rows, time.perf_counter() - start
+
+
+def analyze_all_counties(start_date=None, end_date=None, workers=None, mode='python', output='Wyniki_krajowe.csv'):
+    mongo = MongoManager()
+    redis = RedisManager()
+
+    if not start_date or not end_date:
+        start_date, end_date = get_date_range(mongo)
+
+    counts = redis.get_county_station_counts() or redis.update_county_counts(mongo.db.stacje.distinct('station_id'))
+    counties = [(c['properties']['id'], c['properties']['name'])
+                for c in mongo.db.powiaty.find({}, {'_id': 0, 'properties.id': 1, 'properties.name': 1})]
+
+    # najwieksze powiaty najpierw, zeby na koncu nie czekac na jeden dlugi
+    counties = sorted((c for c in counties if counts.get(county_key(c[0]), 0) > 0),
+                      key=lambda c: counts.get(county_key(c[0]), 0), reverse=True)
+
+    start = time.perf_counter()
+    rows, timings = [], []
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(_analyze_county, c_id, name, start_date, end_date, mode) for c_id, name in counties]
+
+        for future in as_completed(futures):
+            county_id, county_name, county_rows, elapsed = future.result()
+            rows.extend(county_rows)
+            timings.append({'county_id': county_id, 'county': county_name,
+                            'stations': len(county_rows), 'seconds': elapsed})
+
+    table = pd.DataFrame(rows).sort_values(['county', 'station_id'], ignore_index=True) if rows else pd.DataFrame()
+    timings = pd.DataFrame(timings)
+
+    if output and not table.empty:
+        table.to_csv(output, index=False)
+
+    total = time.perf_counter() - start
+    print(f'Batch // {len(counties)} counties, {len(table)} stations in {total:.2f}s '
+          f'(sum of county times {timings["seconds"].sum() if not timings.empty else 0:.2f}s).')
+    if not timings.empty:
+        print(timings.sort_values('seconds', ascending=False).head(10).to_string(index=False))
+
+    return table, timings
+
+
+def county_summary(table):
+    # srednie dzien/noc na powiat wazone liczba pomiarow, jak w podsumowaniu GUI
+    day = table['avg_temp_day'].fillna(0) * table['day_measurements']
+    night = table['avg_temp_night'].fillna(0) * table['night_measurements']
+    grouped = table.assign(day_total=day, night_total=night).groupby(['county_id', 'county'], as_index=False).agg(
+        stations=('station_id', 'count'),
+        day_total=('day_total', 'sum'),
+        day_measurements=('day_measurements', 'sum'),
+        night_total=('night_total', 'sum'),
+        night_measurements=('night_measurements', 'sum'))
+
+    grouped['avg_temp_day'] = grouped['day_total'] / grouped['day_measurements']
+    grouped['avg_temp_night'] = grouped['night_total'] / grouped['night_measurements']
+    grouped['difference'] = grouped['avg_temp_day'] - grouped['avg_temp_night']
+    return grouped.drop(columns=['day_total', 'night_total'])
+
+
+if __name__ == "__main__":
+    analyze_all_counties()
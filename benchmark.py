@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import subprocess
+import statistics
+import tracemalloc
+import datetime
+import numpy as np
+import pandas as pd
+from databases import (MongoManager, RedisManager, analyze_county_day_night, build_rollups,
+                       get_counties_with_station_count, measurement_columns)
+from main import AnalysisManager, iter_csv_documents, prepare_csv, measurement_frame
+
+# skale od jednego miesiaca i 100 stacji do 10 lat i 10 000 stacji
+SCALES = {
+    'small': {'stations': 100, 'months': 1},
+    'medium': {'stations': 1000, 'months': 12},
+    'large': {'stations': 10_000, 'months': 120}
+}
+# moduly mierzone przez import_times; cli ma startowac bez geopandas, pandas i folium
+STARTUP_MODULES = ('cli', 'databases', 'cache', 'main', 'mapka')
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# prostokat otaczajacy Polske, dzielony na siatke sztucznych powiatow
+BBOX = (14.1, 49.0, 24.1, 54.8)
+
+
+def _measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _legacy_dataframe(measurements, positions):
+    # poprzednia implementacja prepare_dataframe: astral per dokument i slownik per pomiar
+    from astral import LocationInfo
+    from astral.sun import sun
+
+    daytime = []
+    for doc in measurements:
+        if doc['station_id'] not in positions:
+            continue
+        lon, lat = positions[doc['station_id']]
+        s = sun(LocationInfo(latitude=lat, longitude=lon).observer, date=pd.to_datetime(doc['date']))
+        sunrise = s['sunrise'].strftime('%H:%M')
+        sunset = s['sunset'].strftime('%H:%M')
+
+        for m in doc['values']:
+            daytime.append({
+                'station_id': doc['station_id'],
+                'date': doc['date'],
+                'time': m['time'],
+                'is_day': sunrise <= m['time'] <= sunset,
+                'value': m['value']
+            })
+
+    return pd.DataFrame(daytime)
+
+
+def _columnar_dataframe(measurements, positions):
+    return measurement_frame(*measurement_columns(measurements, with_m_type=True), positions)
+
+
+def compare_dataframe(stations_path, measurement_path):
+    import geopandas as gpd
+    stations = gpd.read_file(stations_path).to_crs(epsg=4326)
+    positions = {int(s_id): (p.x, p.y) for s_id, p in zip(stations['ifcid'], stations.geometry)}
+
+    docs = prepare_csv(measurement_path)
+    projected = [{'station_id': d['station_id'], 'date': d['date'],
+                  'time': [v['time'] for v in d['values']],
+                  'value': [v['value'] for v in d['values']]} for d in docs]
+
+    results, frames = {}, {}
+    for name, func, data in (('legacy', _legacy_dataframe, docs), ('columnar', _columnar_dataframe, projected)):
+        df, elapsed, peak = _measure(func, data, positions)
+        frames[name] = df
+        results[name] = {
+            'rows': len(df),
+            'seconds': round(elapsed, 3),
+            'peak_mb': round(peak / 2 ** 20, 1),
+            'frame_mb': round(float(df.memory_usage(deep=True).sum()) / 2 ** 20, 1)
+        }
+        print(f"Benchmark // {name}: {results[name]}")
+
+    # stara wersja porownywala wschod/zachod w UTC z lokalnym czasem pomiaru
+    if len(frames['legacy']) == len(frames['columnar']):
+        changed = frames['legacy']['is_day'].to_numpy() != frames['columnar']['is_day'].to_numpy()
+        results['reclassified'] = int(changed.sum())
+        print(f"Benchmark // is_day changed for {results['reclassified']} of {len(frames['columnar'])} rows.")
+
+    return results
+
+
+def synthetic_regions(n_stations, grid=(10, 8), seed=0):
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = BBOX
+    cols, rows = grid
+    dx, dy = (max_lon - min_lon) / cols, (max_lat - min_lat) / rows
+
+    counties = []
+    for row in range(rows):
+        for col in range(cols):
+            x, y = min_lon + col * dx, min_lat + row * dy
+            counties.append({'type': 'Feature',
+                             'properties': {'name': f'powiat_{row}_{col}', 'id': str(row * cols + col)},
+                             'geometry': {'type': 'Polygon',
+                                          'coordinates': [[[x, y], [x + dx, y], [x + dx, y + dy], [x, y + dy], [x, y]]]}})
+
+    lons = rng.uniform(min_lon, max_lon, n_stations)
+    lats = rng.uniform(min_lat, max_lat, n_stations)
+    cells = (np.minimum(((lats - min_lat) // dy).astype(int), rows - 1) * cols
+             + np.minimum(((lons - min_lon) // dx).astype(int), cols - 1))
+
+    stations = [{'type': 'Feature',
+                 'properties': {'ifcid': 100_000 + i, 'name1': f'Stacja {i}',
+                                'powiatinfo': {'nazwa': counties[c]['properties']['name'],
+                                               'id': counties[c]['properties']['id']}},
+                 'geometry': {'type': 'Point', 'coordinates': [round(float(lon), 6), round(float(lat), 6)]}}
+                for i, (lon, lat, c) in enumerate(zip(lons, lats, cells))]
+    return stations, counties
+
+
+def write_synthetic_csv(path, station_ids, start_date, months, m_type='B00300S', seed=0):
+    # odczyty co 10 minut w formacie IMGW, plik ulozony stacjami jak oryginal
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(start_date, 'M')
+    stamps = np.arange(start.astype('datetime64[m]'), (start + months).astype('datetime64[m]'), 10)
+    labels = np.datetime_as_string(stamps, unit='m')
+    labels = np.char.replace(labels, 'T', ' ')
+
+    day_of_year = (stamps.astype('datetime64[D]') - stamps.astype('datetime64[Y]')).astype(np.float64)
+    minute = (stamps - stamps.astype('datetime64[D]')).astype(np.float64)
+    base = 8.0 - 10.0 * np.cos(2 * np.pi * day_of_year / 365.25) - 5.0 * np.cos(2 * np.pi * (minute - 120) / 1440)
+
+    rows = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for s_id in station_ids:
+            values = np.round(base + rng.normal(0.0, 1.5, len(stamps)), 1)
+            f.write('\n'.join(f'{s_id};{m_type};{t};{v}' for t, v in zip(labels, values.tolist())))
+            f.write('\n')
+            rows += len(stamps)
+    return rows
+
+
+def connect(backend='mock'):
+    if backend == 'local':
+        return MongoManager(database='projekt2_benchmark', check_plans=False), RedisManager()
+
+    # mongomock 4.x nie obsluguje pymongo>=4.9 (add_replace() got an unexpected keyword 'sort') - potrzebne pymongo<4.9
+    import fakeredis
+    import mongomock
+    return (MongoManager(database='projekt2_benchmark', check_plans=False, client=mongomock.MongoClient()),
+            RedisManager(connection_class=getattr(fakeredis, 'FakeRedisConnection', fakeredis.FakeConnection),
+                         server=fakeredis.FakeServer()))
+
+
+def _timed(results, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    results[name] = round(time.perf_counter() - start, 4)
+    print(f'Benchmark // {name}: {results[name]:.3f}s')
+    return result
+
+
+def load_synthetic(mongo, redis, n_stations, months, start_date='2025-01-01', workdir=None, seed=0, grid=(10, 8),
+                   timings=None):
+    # sztuczne stacje, powiaty i plik CSV wczytane tak jak w main; uzywane przez benchmark i testy
+    timings = {} if timings is None else timings
+    station_data, county_data = synthetic_regions(n_stations, grid, seed)
+    station_ids = [s['properties']['ifcid'] for s in station_data]
+
+    workdir = workdir or tempfile.mkdtemp(prefix='pag_benchmark_')
+    csv_path = os.path.join(workdir, f'B00300S_{n_stations}x{months}.csv')
+    rows = write_synthetic_csv(csv_path, station_ids, start_date, months, seed=seed)
+
+    # dokumenty prosto z czytnika porcjami do Mongo - przy skali medium i large cala lista nie zmiescilaby sie w pamieci
+    _timed(timings, 'csv_to_mongo', mongo.insert_data, iter_csv_documents(csv_path), county_data)
+    _timed(timings, 'redis_insert_data', redis.insert_data, station_data)
+    redis.update_county_counts(station_ids)
+    return county_data, csv_path, rows
+
+
+def run_suite(scale='small', stations=None, months=None, backend='mock', start_date='2025-01-01',
+              modes=('python', 'rollup'), output='benchmark_results.json', workdir=None, seed=0):
+    config = dict(SCALES[scale])
+    config.update({k: v for k, v in (('stations', stations), ('months', months)) if v is not None})
+
+    mongo, redis = connect(backend)
+    # benchmark zawsze startuje od pustej bazy i pustego Redisa
+    mongo.client.drop_database(mongo.db.name)
+    redis.db.flushdb()
+
+    timings = {}
+    county_data, csv_path, rows = load_synthetic(mongo, redis, config['stations'], config['months'], start_date,
+                                                 workdir, seed, timings=timings)
+    _timed(timings, 'get_counties_with_station_count', get_counties_with_station_count, mongo, redis)
+
+    end_date = str((np.datetime64(start_date, 'M') + config['months']).astype('datetime64[D]') - 1)
+    if 'rollup' in modes:
+        _timed(timings, 'build_rollups', build_rollups, mongo, redis)
+
+    counts = redis.get_county_station_counts()
+    busiest = max(county_data, key=lambda c: counts.get(c['properties']['id'], 0))['properties']['name']
+    for mode in modes:
+        _timed(timings, f'analyze_county_day_night[{mode}]', analyze_county_day_night,
+               mongo, redis, busiest, start_date, end_date, mode)
+
+    # ramka porcjami, tak jak export_dataframe - liczy sie czas budowy, nie trzymanie calosci
+    analysis = AnalysisManager(mongo, redis)
+    frame_rows = _timed(timings, 'iter_dataframe', lambda: sum(len(df) for df in analysis.iter_dataframe()))
+
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'backend': backend,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'config': {**config, 'start_date': start_date, 'end_date': end_date, 'counties': len(county_data),
+                   'csv_rows': rows, 'csv_mb': round(os.path.getsize(csv_path) / 2 ** 20, 1),
+                   'dataframe_rows': frame_rows, 'analyzed_county': busiest},
+        'seconds': timings
+    }
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'Benchmark // Results saved to {output}.')
+    return results
+
+
+def import_times(modules=STARTUP_MODULES, top=5):
+    # -X importtime w osobnym procesie dla kazdego modulu - czas laczny i najciezsze bezposrednie importy [ms]
+    results = {}
+    for module in modules:
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                              capture_output=True, text=True, cwd=ROOT)
+        rows = []
+        for line in proc.stderr.splitlines():
+            parts = line.split('|')
+            if line.startswith('import time:') and len(parts) == 3 and parts[1].strip().isdigit():
+                name = parts[2].rstrip()
+                rows.append((name.strip(), (len(name) - len(name.lstrip()) - 1) // 2, int(parts[1]) / 1000))
+
+        total = next((ms for name, depth, ms in reversed(rows) if name == module and depth == 0), None)
+        heaviest = sorted(((ms, name) for name, depth, ms in rows if depth == 1), reverse=True)[:top]
+        results[module] = {'ms': None if total is None else round(total, 1),
+                           'heaviest': {name: round(ms, 1) for ms, name in heaviest}}
+        print(f'Benchmark // import {module}: ' + ('failed' if total is None else f'{total:.0f} ms'))
+    return results
+
+
+def cli_times(argv, repeat=5):
+    # pelny czas procesu cli.py razem ze startem interpretera; pierwsze wywolanie rozgrzewa cache analiz
+    subprocess.run([sys.executable, 'cli.py', *argv], capture_output=True, cwd=ROOT)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, 'cli.py', *argv], capture_output=True, text=True, cwd=ROOT)
+        times.append(time.perf_counter() - start)
+        if proc.returncode:
+            print(f'Benchmark // cli.py {" ".join(argv)} failed: {proc.stderr.strip()}')
+            return None
+    print(f'Benchmark // cli.py {" ".join(argv)}: median {statistics.median(times):.3f}s')
+    return {'median': round(statistics.median(times), 4), 'min': round(min(times), 4), 'runs': repeat}
+
+
+def run_startup(county=None, start_date=None, end_date=None, output='startup_results.json'):
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'imports': import_times(),
+        'cli_help': cli_times(['--help'])
+    }
+    if county:
+        period = [f'--from={start_date}', f'--to={end_date}'] if start_date and end_date else []
+        results['cli_analyze_cached'] = cli_times(['--format', 'json', 'analyze', '--county', county, *period])
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'Benchmark // Results saved to {output}.')
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        compare_dataframe(r'Dane/effacility.geojson', r'Dane/B00300S_2025_09.csv')
+    elif len(sys.argv) > 1 and sys.argv[1] == 'startup':
+        run_startup(*sys.argv[2:5])
+    else:
+        run_suite(*sys.argv[1:2], backend=sys.argv[2] if len(sys.argv) > 2 else 'mock')
@@ -0,0 +1,55 @@
+import json
+from collections import OrderedDict
+from databases import DEFAULT_VARIANT, analyze_county_day_night, county_key, normalize_m_types
+
+
+class AnalysisCache:
+    def __init__(self, mongo_mgr, redis_mgr, maxsize=128, ttl=24 * 3600):
+        self.mongo = mongo_mgr
+        self.redis = redis_mgr
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.local = OrderedDict()
+        self.county_ids = {}
+        self.stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0}
+
+    def _county_id(self, county_name):
+        if county_name not in self.county_ids:
+            county = self.mongo.db.powiaty.find_one({'properties.name': county_name}, {'properties.id': 1})
+            if county is None:
+                raise KeyError(f'Mongo // Unknown county: {county_name}.')
+            self.county_ids[county_name] = county_key(county['properties']['id'])
+        return self.county_ids[county_name]
+
+    def key(self, county_name, start_date, end_date, mode='rollup', m_types=None, variant=DEFAULT_VARIANT):
+        # wersja danych jest czescia klucza, wiec nowe pomiary automatycznie uniewazniaja wpisy;
+        # tryb tez - rollup i aggregate moga sie roznic (np. dobowe jeszcze nieprzeliczone)
+        return (f'analysis:{self._county_id(county_name)}:{start_date}:{end_date}:{mode}:'
+                f'{",".join(normalize_m_types(m_types))}:{variant}:{self.redis.get_data_version()}')
+
+    def analyze(self, county_name, start_date, end_date, mode='rollup', m_types=None, variant=DEFAULT_VARIANT):
+        key = self.key(county_name, start_date, end_date, mode, m_types, variant)
+
+        if key in self.local:
+            self.local.move_to_end(key)
+            self.stats['local_hits'] += 1
+            return self.local[key]
+
+        cached = self.redis.db.get(key)
+        if cached:
+            self.stats['redis_hits'] += 1
+            result = json.loads(cached)
+        else:
+            self.stats['misses'] += 1
+            result = analyze_county_day_night(self.mongo, self.redis, county_name, start_date, end_date, mode,
+                                              m_types, variant)
+            self.redis.db.set(key, json.dumps(result), ex=self.ttl)
+
+        self.local[key] = result
+        if len(self.local) > self.maxsize:
+            self.local.popitem(last=False)
+        return result
+
+    def clear(self):
+        self.local.clear()
+        self.county_ids.clear()
@@ -0,0 +1,152 @@
+import sys
+import json
+import time
+import argparse
+import functools
+from contextlib import redirect_stdout
+
+# na starcie tylko biblioteka standardowa - pymongo, redis i numpy dopiero przy pierwszym zapytaniu,
+# geopandas, pandas i folium wcale
+
+
+@functools.lru_cache(maxsize=None)
+def connect(mongo_host='mongodb://localhost:27017/', redis_host='localhost', redis_port=6379):
+    # jedna para managerow na proces - kolejne polecenia korzystaja z tych samych pul polaczen
+    from databases import MongoManager, RedisManager
+    with redirect_stdout(sys.stderr):
+        return MongoManager(mongo_host, check_plans=False), RedisManager(redis_host, redis_port)
+
+
+@functools.lru_cache(maxsize=None)
+def analysis_cache(mongo_host='mongodb://localhost:27017/', redis_host='localhost', redis_port=6379):
+    from cache import AnalysisCache
+    return AnalysisCache(*connect(mongo_host, redis_host, redis_port))
+
+
+def _date_range(args):
+    if args.start and args.end:
+        return args.start, args.end
+    from databases import get_date_range
+    first, last = get_date_range(connect(args.mongo, args.redis_host, args.redis_port)[0])
+    return args.start or first, args.end or last
+
+
+def analyze(args):
+    start_date, end_date = _date_range(args)
+    if args.no_cache:
+        from databases import analyze_county_day_night
+        mongo, redis = connect(args.mongo, args.redis_host, args.redis_port)
+        return analyze_county_day_night(mongo, redis, args.county, start_date, end_date, args.mode, args.parameters,
+                                        args.variant)
+    return analysis_cache(args.mongo, args.redis_host, args.redis_port).analyze(
+        args.county, start_date, end_date, args.mode, args.parameters, args.variant)
+
+
+def timeseries(args):
+    from databases import county_timeseries
+    start_date, end_date = _date_range(args)
+    mongo, redis = connect(args.mongo, args.redis_host, args.redis_port)
+    return county_timeseries(mongo, redis, args.county, start_date, end_date, args.resolution, args.parameter,
+                             args.mode)
+
+
+def counties(args):
+    from databases import get_counties_with_station_count
+    return get_counties_with_station_count(*connect(args.mongo, args.redis_host, args.redis_port))
+
+
+def _format_analysis(result):
+    lines = [f"Powiat: {result['county'].get('name')}  ({result['date_range']['start']} - {result['date_range']['end']})"]
+    for s in result['stations']:
+        a = s['analysis']
+        day = '-' if a['avg_temp_day'] is None else f"{a['avg_temp_day']:.2f}"
+        night = '-' if a['avg_temp_night'] is None else f"{a['avg_temp_night']:.2f}"
+        lines.append(f"{s['station_id']:>10}  {s['name']:<30} dzien {day:>7}  noc {night:>7}")
+    lines.append(f"Stacji: {len(result['stations'])}")
+    return '\n'.join(lines)
+
+
+def _format_timeseries(result):
+    lines = [f"Powiat: {result['county'].get('name')}  {result['m_type']} co {result['resolution']}"]
+    for s_id, series in result['stations'].items():
+        for row in zip(series['time'], series['min'], series['max'], series['mean'], series['count']):
+            lines.append(f'{s_id:>10}  {row[0]}  min {row[1]:7.2f}  max {row[2]:7.2f}  srednia {row[3]:7.2f}  n {row[4]}')
+    return '\n'.join(lines)
+
+
+def _format_counties(result):
+    return '\n'.join(f'{name:<40} {count:>5}' for name, count in sorted(result.items()))
+
+
+COMMANDS = {
+    'analyze': (analyze, _format_analysis),
+    'timeseries': (timeseries, _format_timeseries),
+    'counties': (counties, _format_counties)
+}
+
+
+def build_parser():
+    # --format i --time dzialaja przed i po nazwie polecenia; w poleceniach bez domyslnych (SUPPRESS), zeby nie
+    # nadpisaly wartosci podanej przed poleceniem
+    def output_options(format_default, time_default):
+        options = argparse.ArgumentParser(add_help=False)
+        options.add_argument('--format', choices=['json', 'text'], default=format_default, help='format wyniku (domyslnie text)')
+        options.add_argument('--time', action='store_true', default=time_default, help='wypisz czas wykonania na stderr')
+        return options
+
+    output = output_options(argparse.SUPPRESS, argparse.SUPPRESS)
+    parser = argparse.ArgumentParser(prog='cli.py', description='Szybkie zapytania bez ladowania GUI i danych przestrzennych',
+                                     parents=[output_options('text', False)])
+    parser.add_argument('--mongo', default='mongodb://localhost:27017/', help='adres MongoDB')
+    parser.add_argument('--redis-host', default='localhost', help='host Redisa')
+    parser.add_argument('--redis-port', type=int, default=6379, help='port Redisa')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def period(command):
+        command.add_argument('--county', required=True, help='nazwa powiatu')
+        command.add_argument('--from', dest='start', metavar='RRRR-MM-DD', help='poczatek zakresu (domyslnie pierwszy dzien danych)')
+        command.add_argument('--to', dest='end', metavar='RRRR-MM-DD', help='koniec zakresu (domyslnie ostatni dzien danych)')
+
+    command = commands.add_parser('analyze', parents=[output], help='srednie dzien/noc dla stacji powiatu')
+    period(command)
+    command.add_argument('--mode', choices=['python', 'aggregate', 'rollup'],
+                         help="sposob liczenia (domyslnie rollup dla wariantu sun, python dla pozostalych)")
+    command.add_argument('--parameters', nargs='+', metavar='M_TYPE', help='kody parametrow IMGW, np. B00300S B00802A')
+    command.add_argument('--variant', choices=['sun', 'civil', 'nautical'], default='sun',
+                         help="granica dnia: wschod/zachod albo zmierzch cywilny/zeglarski (tryby python i aggregate)")
+    command.add_argument('--no-cache', action='store_true', help='licz od nowa, z pominieciem cache analiz')
+
+    command = commands.add_parser('timeseries', parents=[output], help='szereg czasowy min/max/srednia dla stacji powiatu')
+    period(command)
+    command.add_argument('--resolution', choices=['10min', 'hour', 'day'], default='hour', help='szerokosc przedzialu')
+    command.add_argument('--parameter', default='B00300S', metavar='M_TYPE', help='kod parametru IMGW')
+    command.add_argument('--mode', choices=['python', 'aggregate'], default='python', help='sposob liczenia')
+
+    commands.add_parser('counties', parents=[output], help='powiaty z liczba stacji')
+    return parser
+
+
+def run(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'analyze':
+        # dobowe sa liczone tylko dla wschodu/zachodu
+        if args.mode == 'rollup' and args.variant != 'sun':
+            parser.error(f'--mode rollup dziala tylko z --variant sun, dla {args.variant} uzyj python albo aggregate')
+        args.mode = args.mode or ('rollup' if args.variant == 'sun' else 'python')
+    start = time.perf_counter()
+    func, formatter = COMMANDS[args.command]
+    try:
+        result = func(args)
+    except Exception as e:
+        print(f'CLI // {args.command} failed: {e}.', file=sys.stderr)
+        return 1
+
+    print(json.dumps(result, ensure_ascii=False) if args.format == 'json' else formatter(result))
+    if args.time:
+        print(f'CLI // {args.command} in {time.perf_counter() - start:.3f}s.', file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -1,21 +1,38 @@
+import bson
 import pymongo
 import redis
 import json
-import pandas as pd
-from astral import LocationInfo
-from astral.sun import sun
+import math
+import time
+import datetime
+import numpy as np
+from solar import DAY_VARIANTS, DEFAULT_VARIANT, SolarTable, date_range, day_mask, time_to_minutes
+from metrics import METRICS, timed
 
 class MongoManager:
-    def __init__(self, host="mongodb://localhost:27017/", database='projekt2'):
+    def __init__(self, host="mongodb://localhost:27017/", database='projekt2', check_plans=True, client=None,
+                 schema='documents'):
+       if schema not in MEASUREMENT_SCHEMAS:
+           raise ValueError(f'Mongo // Unknown measurement schema: {schema}.')
+       self.schema = schema
        try:
-           self.client = pymongo.MongoClient()
+           # client pozwala podstawic np. mongomock w benchmarku
+           if client is None:
+               client = pymongo.MongoClient(host, event_listeners=[MongoCommandListener()])
+           self.client = client
            self.db = self.client[database]
+           self.ensure_indexes()
+           if check_plans:
+               self.check_query_plans()
 
            print('Connected to MongoDB.')
+       except RuntimeError:
+           raise
        except Exception as e:
            print(f'Failed to connect to MongoDB: {e}.')
 
-    def insert_data(self, stations, counties):
+    @timed('mongo.insert_data')
+    def insert_data(self, stations, counties, batch_size=10_000):
         if not stations:
             print('Mongo // No stations to insert.')
         elif not counties:
@@ -24,8 +41,8 @@ class MongoManager:
         try:
             s_collection = self.db.stacje
             s_collection.delete_many({})
-            s_collection.insert_many(stations)
-            print('Mongo // Stations data inserted successfully.')
+            inserted = self.insert_measurements(stations, batch_size)
+            print(f'Mongo // Stations data inserted successfully ({inserted} documents).')
 
             c_collection = self.db.powiaty
             c_collection.delete_many({})
@@ -35,41 +52,505 @@ class MongoManager:
         except Exception as e:
             print(f'Mongo // Failed to insert data: {e}.')
 
+    @timed('mongo.insert_measurements')
+    def insert_measurements(self, measurements, batch_size=10_000):
+        # zapis porcjami, zeby w pamieci nie trzymac calego miesiaca (albo roku)
+        inserted = 0
+        batch = []
+        for doc in measurements:
+            if self.schema == 'packed':
+                key = {field: doc[field] for field, _ in MEASUREMENT_KEY}
+                doc = dict(key, **measurement_fields(doc['values'], 'packed'))
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                inserted += len(self.db.stacje.insert_many(batch, ordered=False).inserted_ids)
+                batch = []
+
+        if batch:
+            inserted += len(self.db.stacje.insert_many(batch, ordered=False).inserted_ids)
+        return inserted
+
+    def ensure_indexes(self):
+        self.db.stacje.create_index(MEASUREMENT_KEY, unique=True, name='measurement_key')
+        self.db.stacje.create_index([('station_id', pymongo.ASCENDING), ('date', pymongo.ASCENDING)], name='station_date')
+        self.db.stacje.create_index([('date', pymongo.ASCENDING)], name='date')
+        self.db.stacje.create_index([('m_type', pymongo.ASCENDING), ('date', pymongo.ASCENDING)], name='m_type_date')
+        self.db.dobowe.create_index(ROLLUP_KEY, name='station_type_date')
+        self.db.powiaty.create_index([('properties.name', pymongo.ASCENDING)], name='county_name')
+        self.db.wojewodztwa.create_index([('properties.name', pymongo.ASCENDING)], name='voivodeship_name')
+        self.db.powiaty.create_index([('properties.id', pymongo.ASCENDING)], name='county_id')
+
+        try:
+            self.db.powiaty.create_index([('geometry', pymongo.GEOSPHERE)], name='county_geometry')
+        except pymongo.errors.OperationFailure as e:
+            # mongo odrzuca indeks 2dsphere, jesli ktorys poligon ma np. samoprzeciecia
+            print(f'Mongo // Could not create 2dsphere index on counties: {e}.')
+
+    def check_query_plans(self):
+        # kazde zapytanie analizy musi isc po indeksie; COLLSCAN na pelnych danych to minuty
+        plans = {
+            'county measurements': self.db.command('aggregate', 'stacje', explain=True, pipeline=[
+                {'$match': {'station_id': {'$in': [0]}, 'm_type': {'$in': ['']},
+                            'date': {'$gte': '0000-00-00', '$lte': '9999-99-99'}}},
+                {'$project': MEASUREMENT_COLUMNS}
+            ]),
+            'measurements by type': self.db.command('aggregate', 'stacje', explain=True, pipeline=[
+                {'$match': {'m_type': {'$in': ['']}, 'date': {'$gte': '0000-00-00', '$lte': '9999-99-99'}}},
+                {'$project': MEASUREMENT_COLUMNS}
+            ]),
+            'county rollups': self.db.dobowe.find(
+                {'station_id': {'$in': [0]}, 'm_type': {'$in': ['']}, 'date': {'$gte': '0000-00-00', '$lte': '9999-99-99'}}
+            ).sort(ROLLUP_KEY).explain(),
+            'stations with data': self.db.command('explain', {'distinct': 'stacje', 'key': 'station_id'}),
+            'first date': self.db.stacje.find({}, {'date': 1}).sort('date', pymongo.ASCENDING).limit(1).explain(),
+            'last date': self.db.stacje.find({}, {'date': 1}).sort('date', pymongo.DESCENDING).limit(1).explain(),
+            'county by name': self.db.powiaty.find({'properties.name': ''}).limit(1).explain(),
+            'county by id': self.db.powiaty.find({'properties.id': ''}).limit(1).explain(),
+            'voivodeship by name': self.db.wojewodztwa.find({'properties.name': ''}).limit(1).explain()
+        }
+
+        degraded = [name for name, plan in plans.items() if _has_stage(plan, 'COLLSCAN')]
+        if degraded:
+            raise RuntimeError(f"Mongo // Queries fell back to COLLSCAN: {', '.join(degraded)}.")
+
+    @timed('mongo.upsert_measurements')
+    def upsert_measurements(self, measurements, batch_size=10_000):
+        # ponowne wczytanie tego samego dnia nadpisuje go zamiast dublowac
+        written = 0
+        batch = []
+        for doc in measurements:
+            key = {field: doc[field] for field, _ in MEASUREMENT_KEY}
+            batch.append(pymongo.UpdateOne(key, measurement_update(doc['values'], self.schema), upsert=True))
+            if len(batch) >= batch_size:
+                written += self._write_batch(batch)
+                batch = []
+
+        if batch:
+            written += self._write_batch(batch)
+        return written
+
+    def _write_batch(self, batch):
+        result = self.db.stacje.bulk_write(batch, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    @timed('mongo.store_solar_table')
+    def store_solar_table(self, table, only_missing=False):
+        keys = {station_day_key(s_id, date, table.variant): (i, j)
+                for i, s_id in enumerate(table.station_ids)
+                for j, date in enumerate(table.dates)}
+        if only_missing:
+            # granice zaleza tylko od pozycji stacji i daty, wiec zapisanych dni nie trzeba liczyc od nowa
+            for key in self.db.slonce.distinct('_id', {'_id': {'$in': list(keys)}}):
+                del keys[key]
+
+        ops = [
+            pymongo.ReplaceOne({'_id': key}, {
+                'station_id': int(table.station_ids[i]),
+                'date': str(table.dates[j]),
+                'variant': table.variant,
+                'sunrise': int(table.sunrise[i, j]),
+                'sunset': int(table.sunset[i, j])
+            }, upsert=True)
+            for key, (i, j) in keys.items()
+        ]
+        if ops:
+            self.db.slonce.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    @timed('mongo.store_rollups')
+    def store_rollups(self, daily):
+        ops = [
+            pymongo.ReplaceOne({'_id': rollup_key(s_id, m_type, date)}, {
+                'station_id': int(s_id),
+                'm_type': str(m_type),
+                'date': str(date),
+                # dobowe liczone zawsze dla wschodu/zachodu, inne granice dnia tylko w trybach python i aggregate
+                'variant': DEFAULT_VARIANT,
+                'day_sum': float(daily['day_sum'][i]),
+                'day_count': int(daily['day_count'][i]),
+                'night_sum': float(daily['night_sum'][i]),
+                'night_count': int(daily['night_count'][i]),
+                'min': float(daily['min'][i]),
+                'max': float(daily['max'][i])
+            }, upsert=True)
+            for i, (s_id, m_type, date) in enumerate(zip(daily['station_id'], daily['m_type'], daily['date']))
+        ]
+        if ops:
+            self.db.dobowe.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    @timed('mongo.replace_counties')
+    def replace_counties(self, counties):
+        self.db.powiaty.delete_many({})
+        if counties:
+            self.db.powiaty.insert_many(counties)
+        print(f'Mongo // Counties data replaced ({len(counties)} counties).')
+
+    @timed('mongo.replace_voivodeships')
+    def replace_voivodeships(self, voivodeships):
+        self.db.wojewodztwa.delete_many({})
+        if voivodeships:
+            self.db.wojewodztwa.insert_many(voivodeships)
+        print(f'Mongo // Voivodeships data replaced ({len(voivodeships)} voivodeships).')
+
+    def is_ingested(self, checksum):
+        return self.db.manifest.count_documents({'_id': checksum}, limit=1) > 0
+
+    def is_file_ingested(self, path, size, mtime):
+        # (sciezka, rozmiar, mtime) z manifestu - niezmieniony plik pomijany bez liczenia sumy kontrolnej
+        return self.db.manifest.count_documents({'path': str(path), 'size': size, 'mtime': mtime}, limit=1) > 0
+
+    def mark_ingested(self, checksum, path, kind, documents=0, size=None, mtime=None):
+        if kind != 'measurements':
+            self.db.manifest.delete_many({'kind': kind})
+        self.db.manifest.replace_one({'_id': checksum}, {
+            'path': str(path),
+            'size': size,
+            'mtime': mtime,
+            'kind': kind,
+            'documents': documents,
+            'loaded_at': datetime.datetime.now(datetime.timezone.utc)
+        }, upsert=True)
+
+    def update_ingested_file(self, checksum, path, size, mtime):
+        # ta sama zawartosc pod inna sciezka albo z nowym mtime - nastepne uruchomienie pominie plik bez hashowania
+        self.db.manifest.update_one({'_id': checksum}, {'$set': {'path': str(path), 'size': size, 'mtime': mtime}})
+
+
+def _has_stage(plan, stage):
+    if isinstance(plan, dict):
+        return plan.get('stage') == stage or any(
+            _has_stage(v, stage) for k, v in plan.items() if k not in ('rejectedPlans', 'allPlansExecution'))
+    if isinstance(plan, list):
+        return any(_has_stage(v, stage) for v in plan)
+    return False
+
+
+def county_key(county_id):
+    # id powiatu jako tekst do kluczy Redisa; sjoin z how='left' zamienia id na float (400.0), a brak powiatu na NaN
+    if county_id is None or (isinstance(county_id, float) and math.isnan(county_id)):
+        return None
+    try:
+        number = float(county_id)
+    except (TypeError, ValueError):
+        return str(county_id)
+    return str(int(number)) if number.is_integer() else str(county_id)
+
+
+def station_day_key(station_id, date, variant=DEFAULT_VARIANT):
+    return f'{station_id}|{date}|{variant}'
+
+
+def rollup_key(station_id, m_type, date):
+    return f'{station_id}|{m_type}|{date}'
+
+
+# parametr IMGW z danych 10-minutowych (temperatura powietrza) liczony, gdy nie podano m_types
+DEFAULT_M_TYPE = 'B00300S'
+
+ROLLUP_KEY = [('station_id', pymongo.ASCENDING), ('m_type', pymongo.ASCENDING), ('date', pymongo.ASCENDING)]
+
+
+# schemat packed: 144 sloty po 10 minut jako float32 little-endian + maska obecnosci (1 bit na slot)
+MEASUREMENT_SCHEMAS = ('documents', 'packed')
+SLOTS_PER_DAY = 144
+SLOT_MINUTES = np.arange(SLOTS_PER_DAY, dtype=np.int16) * 10
+
+
+def pack_values(values):
+    minutes = time_to_minutes([v['time'] for v in values])
+    if np.any(minutes % 10):
+        raise ValueError('Mongo // Packed schema needs readings on the 10-minute grid.')
+
+    value = np.array([v['value'] for v in values], dtype=np.float64).reshape(-1)
+    present = ~np.isnan(value)
+
+    slots = np.zeros(SLOTS_PER_DAY, dtype='<f4')
+    mask = np.zeros(SLOTS_PER_DAY, dtype=bool)
+    slots[minutes[present] // 10] = value[present]
+    mask[minutes[present] // 10] = True
+    return slots.tobytes(), np.packbits(mask).tobytes()
+
+
+def decode_values(doc):
+    # lista {'time', 'value'} z dokumentu w dowolnym schemacie
+    if 'packed' not in doc:
+        return doc.get('values', [])
+
+    slots = np.frombuffer(doc['packed'], dtype='<f4')
+    mask = np.unpackbits(np.frombuffer(doc['mask'], dtype=np.uint8)).astype(bool)
+    # str(float32) daje najkrotszy zapis, wiec 11.9 wraca jako 11.9, a nie 11.899999618530273
+    return [{'time': f'{m // 60:02d}:{m % 60:02d}', 'value': float(str(v))}
+            for m, v in zip(SLOT_MINUTES[mask].tolist(), slots[mask])]
+
+
+def measurement_fields(values, schema):
+    if schema == 'packed':
+        packed, mask = pack_values(values)
+        return {'packed': packed, 'mask': mask}
+    return {'values': values}
+
+
+def measurement_update(values, schema):
+    # pola drugiego schematu sa usuwane, zeby dokument nie trzymal danych podwojnie
+    stale = ('values',) if schema == 'packed' else ('packed', 'mask')
+    return {'$set': measurement_fields(values, schema), '$unset': {field: '' for field in stale}}
+
+
+MEASUREMENT_KEY = [('station_id', pymongo.ASCENDING), ('m_type', pymongo.ASCENDING), ('date', pymongo.ASCENDING)]
+
+STATION_FORMATS = ('json', 'hash', 'msgpack')
+
+KM_PER_DEGREE = 111.32
+BOX_MARGIN_KM = 1.0
+
+
+class MongoCommandListener(pymongo.monitoring.CommandListener):
+    # jeden event = jedno polecenie wyslane do serwera; rozmiary polecenia i odpowiedzi liczone z BSON tylko gdy metryki
+    # sa wlaczone - rozmiar polecenia czeka w _sent do zakonczenia, zeby trafic do tego samego wpisu co czas
+    def __init__(self):
+        self._sent = {}
+
+    def started(self, event):
+        if METRICS.enabled:
+            self._sent[(event.connection_id, event.request_id)] = len(bson.encode(event.command))
+
+    def succeeded(self, event):
+        bytes_out = self._sent.pop((event.connection_id, event.request_id), 0)
+        if METRICS.enabled:
+            METRICS.record(f'mongo:{event.command_name}', event.duration_micros / 1e6, round_trips=1,
+                           bytes_out=bytes_out, bytes_in=len(bson.encode(event.reply)))
+
+    def failed(self, event):
+        bytes_out = self._sent.pop((event.connection_id, event.request_id), 0)
+        if METRICS.enabled:
+            METRICS.record(f'mongo:{event.command_name}:failed', event.duration_micros / 1e6, round_trips=1,
+                           bytes_out=bytes_out)
+
+
+def _payload_size(response):
+    if isinstance(response, (bytes, str)):
+        return len(response)
+    if isinstance(response, (list, tuple, set)):
+        return sum(_payload_size(r) for r in response)
+    if isinstance(response, dict):
+        return sum(_payload_size(k) + _payload_size(v) for k, v in response.items())
+    return 8 if response is not None else 0
+
+
+class CountingConnectionMixin:
+    # wyslanie paczki = jeden round trip (pipeline to tez jeden), bajty odpowiedzi liczone z payloadu
+    def send_command(self, *args, **kwargs):
+        self._metric_name = f'redis:{str(args[0]).upper()}' if args else 'redis:command'
+        try:
+            return super().send_command(*args, **kwargs)
+        finally:
+            self._metric_name = None
+
+    def send_packed_command(self, command, check_health=True):
+        if METRICS.enabled:
+            size = len(command) if isinstance(command, (bytes, str)) else sum(len(c) for c in command)
+            METRICS.record(getattr(self, '_metric_name', None) or 'redis:PIPELINE', round_trips=1, bytes_out=size)
+        return super().send_packed_command(command, check_health)
+
+    def read_response(self, *args, **kwargs):
+        response = super().read_response(*args, **kwargs)
+        if METRICS.enabled:
+            METRICS.record('redis:responses', calls=1, bytes_in=_payload_size(response))
+        return response
+
+
+class CountingConnection(CountingConnectionMixin, redis.Connection):
+    pass
+
+
 class RedisManager:
-    def __init__(self, host='localhost', port=6379):
+    def __init__(self, host='localhost', port=6379, **pool_kwargs):
+        pool_kwargs.setdefault('connection_class', CountingConnection)
         try:
-            self.pool = redis.ConnectionPool(host=host, port=port, db=0, decode_responses=True)
+            # pool_kwargs trafia do obu pul, np. connection_class=fakeredis.FakeConnection w benchmarku
+            self.pool = redis.ConnectionPool(host=host, port=port, db=0, decode_responses=True, **pool_kwargs)
             self.db = redis.Redis(connection_pool=self.pool)
+            # msgpack trzyma bajty, wiec odczyt idzie przez klienta bez dekodowania
+            self.raw_pool = redis.ConnectionPool(host=host, port=port, db=0, **pool_kwargs)
+            self.raw = redis.Redis(connection_pool=self.raw_pool)
             self.db.config_set('stop-writes-on-bgsave-error', 'no')
             print('Connected to Redis.')
         except Exception as e:
             print(f'Failed to connect to Redis: {e}.')
 
-    def insert_data(self, stations):
+    @timed('redis.insert_data')
+    def insert_data(self, stations, chunk_size=1000, storage='json', transaction=False):
         if not stations:
             print('Redis // No data to insert.')
+            return
+
+        if storage not in STATION_FORMATS:
+            raise ValueError(f'Redis // Unknown station storage format: {storage}.')
 
         try:
-            for s in stations:
-                props = s.get('properties', {})
-                geom = s.get('geometry', {})
-                s_id = props.get('ifcid')
+            start = time.perf_counter()
+            self.clear_station_index()
+            loaded = 0
+
+            for i in range(0, len(stations), chunk_size):
+                pipe = self.db.pipeline(transaction=transaction)
+                points = []
 
-                if s_id:
-                    lon, lat = geom['coordinates']
-                    station_json = json.dumps(s)
-                    self.db.set(f'station:{s_id}', station_json)
-                    self.db.geoadd('station_points', lon, lat, s_id)
+                for s in stations[i:i + chunk_size]:
+                    props = s.get('properties', {})
+                    geom = s.get('geometry', {})
+                    s_id = props.get('ifcid')
+                    county_id = county_key((props.get('powiatinfo') or {}).get('id'))
 
+                    if s_id:
+                        lon, lat = geom['coordinates']
+                        self._store_station(pipe, s_id, s, storage)
+                        points.extend((lon, lat, s_id))
 
-            print('Redis // Measurements data inserted successfully.')
+                        if county_id:
+                            pipe.sadd('counties', county_id)
+                            pipe.sadd(f'county:{county_id}:stations', s_id)
+
+                if points:
+                    pipe.geoadd('station_points', points)
+                pipe.execute()
+                loaded += len(points) // 3
+
+            self.db.set('station_format', storage)
+            elapsed = time.perf_counter() - start
+            print(f'Redis // {loaded} stations inserted in {elapsed:.2f}s ({loaded / max(elapsed, 1e-9):.0f} stations/s).')
 
         except Exception as e:
             print(f'Redis // Failed to insert data: {e}.')
 
+    def _store_station(self, pipe, s_id, station, storage):
+        key = f'station:{s_id}'
+        if storage == 'json':
+            pipe.set(key, json.dumps(station))
+        elif storage == 'msgpack':
+            import msgpack
+            pipe.set(key, msgpack.packb(station))
+        else:
+            fields = {k: json.dumps(v) for k, v in station.get('properties', {}).items()}
+            fields['_geometry'] = json.dumps(station.get('geometry'))
+            pipe.delete(key)
+            pipe.hset(key, mapping=fields)
+
+    @timed('redis.get_stations')
+    def get_stations(self, s_ids):
+        if not s_ids:
+            return []
+
+        keys = [f'station:{s_id}' for s_id in s_ids]
+        storage = self.db.get('station_format') or 'json'
+
+        if storage == 'json':
+            return [json.loads(d) for d in self.db.mget(keys) if d]
+
+        if storage == 'msgpack':
+            import msgpack
+            return [msgpack.unpackb(d) for d in self.raw.mget(keys) if d]
+
+        pipe = self.db.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+
+        stations = []
+        for fields in pipe.execute():
+            if fields:
+                geometry = json.loads(fields.pop('_geometry'))
+                props = {k: json.loads(v) for k, v in fields.items()}
+                stations.append({'type': 'Feature', 'properties': props, 'geometry': geometry})
+        return stations
+
+    def clear_station_index(self, chunk_size=1000):
+        # stacje usuniete z pliku nie moga zostac w Redisie - razem z powiatami znikaja pozycje i klucze station:*
+        county_ids = self.db.smembers('counties')
+        self.db.delete('counties', 'county_station_counts', 'station_points', *[f'county:{c}:stations' for c in county_ids])
+
+        keys = []
+        for key in self.db.scan_iter(match='station:*', count=chunk_size):
+            keys.append(key)
+            if len(keys) >= chunk_size:
+                self.db.delete(*keys)
+                keys = []
+        if keys:
+            self.db.delete(*keys)
+
+    @timed('redis.update_county_counts')
+    def update_county_counts(self, station_ids=None):
+        # liczba stacji w powiecie; jesli podano station_ids, liczone sa tylko stacje z pomiarami
+        county_ids = list(self.db.smembers('counties'))
+
+        pipe = self.db.pipeline(transaction=False)
+        for c in county_ids:
+            pipe.smembers(f'county:{c}:stations')
+        members = pipe.execute()
+
+        measured = None if station_ids is None else {str(s_id) for s_id in station_ids}
+        counts = {c: len(m if measured is None else m & measured) for c, m in zip(county_ids, members)}
+
+        self.db.delete('county_station_counts')
+        if counts:
+            self.db.hset('county_station_counts', mapping=counts)
+        return counts
+
+    @timed('redis.stations_within_radius')
+    def stations_within_radius(self, lon, lat, radius_km):
+        s_ids = self.db.geosearch('station_points', longitude=lon, latitude=lat, radius=radius_km, unit='km')
+        return self.get_stations(sorted(s_ids, key=int))
+
+    @timed('redis.stations_in_polygon')
+    def stations_in_polygon(self, geometry):
+        # GEOSEARCH BYBOX po prostokacie otaczajacym, potem dokladny test punkt-w-poligonie
+        from shapely.geometry import Point, shape
+        from shapely.prepared import prep
+        polygon = shape(geometry)
+        min_lon, min_lat, max_lon, max_lat = polygon.bounds
+
+        # dlugosc stopnia dlugosci geograficznej jest najwieksza na rownolezniku najblizszym rownika
+        widest = math.cos(math.radians(min(abs(min_lat), abs(max_lat)))) if min_lat * max_lat > 0 else 1.0
+        width = (max_lon - min_lon) * KM_PER_DEGREE * widest + BOX_MARGIN_KM
+        height = (max_lat - min_lat) * KM_PER_DEGREE + BOX_MARGIN_KM
+
+        s_ids = self.db.geosearch('station_points', longitude=(min_lon + max_lon) / 2, latitude=(min_lat + max_lat) / 2,
+                                  width=width, height=height, unit='km')
+
+        prepared = prep(polygon)
+        return [s for s in self.get_stations(sorted(s_ids, key=int))
+                if prepared.contains(Point(s['geometry']['coordinates'][:2]))]
+
+    def get_data_version(self):
+        return self.db.get('data_version') or '0'
+
+    def bump_data_version(self):
+        return self.db.incr('data_version')
+
+    def get_county_station_counts(self):
+        return {c: int(n) for c, n in self.db.hgetall('county_station_counts').items()}
+
+    def get_county_station_ids(self, county_id):
+        return sorted(int(s_id) for s_id in self.db.smembers(f'county:{county_key(county_id)}:stations'))
+
+    @timed('redis.get_county_stations')
+    def get_county_stations(self, county_id):
+        return self.get_stations(self.get_county_station_ids(county_id))
+
+MEASUREMENT_COLUMNS = {
+    '_id': 0,
+    'station_id': 1,
+    'm_type': 1,
+    'date': 1,
+    'time': '$values.time',
+    'value': '$values.value',
+    'packed': 1,
+    'mask': 1
+}
+
+
+@timed('analysis.get_counties_with_station_count')
 def get_counties_with_station_count(mongo_mgr, redis_mgr):
-    station_ids_with_data = set(mongo_mgr.db.stacje.distinct('station_id'))
-    
     counties = list(mongo_mgr.db.powiaty.find({}, {'properties.name': 1, 'properties.id': 1, '_id': 0}))
     
     county_id_to_name = {}
@@ -77,90 +558,113 @@ def get_counties_with_station_count(mongo_mgr, redis_mgr):
         if 'properties' in county:
             county_name = county['properties'].get('name')
             county_id = county['properties'].get('id')
-            if county_name and county_id:
-                county_id_to_name[county_id] = county_name
-    
+            if county_name and county_key(county_id):
+                county_id_to_name[county_key(county_id)] = county_name
+
+    counts = redis_mgr.get_county_station_counts()
+    if not counts:
+        counts = redis_mgr.update_county_counts(mongo_mgr.db.stacje.distinct('station_id'))
+
     county_counts = {name: 0 for name in county_id_to_name.values()}
-    
-    for key in redis_mgr.db.keys('station:*'):
-        station_json = redis_mgr.db.get(key)
-        if station_json:
-            station = json.loads(station_json)
-            s_id = station.get('properties', {}).get('ifcid')
-            county_id = station.get('properties', {}).get('powiatinfo', {}).get('id')
-            
-            if s_id in station_ids_with_data and county_id and county_id in county_id_to_name:
-                county_name = county_id_to_name[county_id]
-                county_counts[county_name] += 1
-    
+    for county_id, county_name in county_id_to_name.items():
+        county_counts[county_name] += counts.get(county_id, 0)
+
     return county_counts
 
 
+@timed('analysis.get_date_range')
 def get_date_range(mongo_mgr):
-    pipeline = [
-        {'$group': {
-            '_id': None,
-            'min_date': {'$min': '$date'},
-            'max_date': {'$max': '$date'}
-        }}
-    ]
-    result = list(mongo_mgr.db.stacje.aggregate(pipeline))
-    if result:
-        return result[0]['min_date'], result[0]['max_date']
+    first = mongo_mgr.db.stacje.find_one({}, {'date': 1}, sort=[('date', pymongo.ASCENDING)])
+    last = mongo_mgr.db.stacje.find_one({}, {'date': 1}, sort=[('date', pymongo.DESCENDING)])
+    if first and last:
+        return first['date'], last['date']
     return None, None
 
 
-def analyze_county_day_night(mongo_mgr, redis_mgr, county_name, start_date, end_date):
+def analyze_county_day_night(mongo_mgr, redis_mgr, county_name, start_date, end_date, mode='python', m_types=None,
+                             variant=DEFAULT_VARIANT):
     county = mongo_mgr.db.powiaty.find_one({'properties.name': county_name})
     county_id = county['properties']['id']
 
-    stations, station_ids = [], []
-    for key in redis_mgr.db.keys('station:*'):
-        station = json.loads(redis_mgr.db.get(key))
-        if station['properties'].get('powiatinfo', {}).get('id') == county_id:
-            stations.append(station)
-            station_ids.append(station['properties']['ifcid'])
-    
-    measurements = list(mongo_mgr.db.stacje.find({
-        'station_id': {'$in': station_ids},
-        'date': {'$gte': start_date, '$lte': end_date}
-    }))
-    
-    results = {
+    stations = redis_mgr.get_county_stations(county_id)
+
+    return {
         'county': county['properties'],
         'county_geometry': county['geometry'],
         'date_range': {'start': start_date, 'end': end_date},
-        'stations': []
+        'stations': analyze_stations_day_night(mongo_mgr, stations, start_date, end_date, mode, m_types, variant)
+    }
+
+
+@timed('analysis.analyze_region_day_night')
+def analyze_region_day_night(mongo_mgr, redis_mgr, geometry, properties, start_date, end_date, mode='python',
+                             m_types=None, variant=DEFAULT_VARIANT):
+    # dowolny poligon; klucze jak w analyze_county_day_night, zeby dzialaly mapka i GUI
+    stations = redis_mgr.stations_in_polygon(geometry)
+
+    return {
+        'county': properties,
+        'county_geometry': geometry,
+        'date_range': {'start': start_date, 'end': end_date},
+        'stations': analyze_stations_day_night(mongo_mgr, stations, start_date, end_date, mode, m_types, variant)
+    }
+
+
+def analyze_voivodeship_day_night(mongo_mgr, redis_mgr, voivodeship_name, start_date, end_date, mode='python',
+                                  m_types=None, variant=DEFAULT_VARIANT):
+    voivodeship = mongo_mgr.db.wojewodztwa.find_one({'properties.name': voivodeship_name})
+    return analyze_region_day_night(mongo_mgr, redis_mgr, voivodeship['geometry'], voivodeship['properties'],
+                                    start_date, end_date, mode, m_types, variant)
+
+
+def analyze_radius_day_night(mongo_mgr, redis_mgr, lon, lat, radius_km, start_date, end_date, mode='python',
+                             m_types=None, variant=DEFAULT_VARIANT):
+    from shapely.affinity import scale
+    from shapely.geometry import Point, mapping
+    stations = redis_mgr.stations_within_radius(lon, lat, radius_km)
+    circle = scale(Point(lon, lat).buffer(radius_km / KM_PER_DEGREE, 64), xfact=1 / math.cos(math.radians(lat)), yfact=1)
+
+    return {
+        'county': {'name': f'{radius_km} km od ({lat:.4f}, {lon:.4f})'},
+        'county_geometry': mapping(circle),
+        'date_range': {'start': start_date, 'end': end_date},
+        'stations': analyze_stations_day_night(mongo_mgr, stations, start_date, end_date, mode, m_types, variant)
     }
 
+
+@timed('analysis.analyze_stations_day_night')
+def analyze_stations_day_night(mongo_mgr, stations, start_date, end_date, mode='python', m_types=None,
+                               variant=DEFAULT_VARIANT):
+    if mode not in DAY_NIGHT_MODES:
+        raise ValueError(f'Analysis // Unknown mode: {mode}.')
+    if variant not in DAY_VARIANTS:
+        raise ValueError(f'Analysis // Unknown day variant: {variant}.')
+
+    m_types = normalize_m_types(m_types)
+    positions = {s['properties']['ifcid']: s['geometry']['coordinates'] for s in stations}
+    sums = DAY_NIGHT_MODES[mode](mongo_mgr, positions, start_date, end_date, m_types, variant)
+    return station_results(stations, sums, m_types)
+
+
+def normalize_m_types(m_types=None):
+    if isinstance(m_types, str):
+        m_types = [m_types]
+    return tuple(dict.fromkeys(m_types)) if m_types else (DEFAULT_M_TYPE,)
+
+
+def station_results(stations, sums, m_types=(DEFAULT_M_TYPE,)):
+    # sumy {m_type: {stacja: (dzien, liczba, noc, liczba)}} -> wynik analizy w kolejnosci stacji;
+    # 'analysis' dotyczy pierwszego parametru, przy kilku parametrach wszystkie sa w 'parameters'
+    results = []
     for station in stations:
         station_id = station['properties']['ifcid']
         coords = station['geometry']['coordinates']
         lon, lat = coords[0], coords[1]
-        
-        station_measurements = [m for m in measurements if m['station_id'] == station_id]
-        
-        if not station_measurements:
+
+        measured = [t for t in m_types if station_id in sums.get(t, {})]
+        if not measured:
             continue
-        
-        day_temps, night_temps = [], []
-        
-        for measurement in station_measurements:
-            date = measurement['date']
-            
-            loc = LocationInfo(latitude=lat, longitude=lon)
-            s = sun(loc.observer, date=pd.to_datetime(date))
-            sunrise = s['sunrise'].strftime('%H:%M')
-            sunset = s['sunset'].strftime('%H:%M')
-            
-            for v in measurement['values']:
-                time = v['time']
-                temp = v['value']
-                
-                if sunrise <= time <= sunset:
-                    day_temps.append(temp)
-                else:
-                    night_temps.append(temp)
+        day_sum, day_count, night_sum, night_count = sums[m_types[0]].get(station_id, (0.0, 0, 0.0, 0))
         
         station_result = {
             'station_id': station_id,
@@ -168,13 +672,394 @@ def analyze_county_day_night(mongo_mgr, redis_mgr, county_name, start_date, end_
             'geometry': {'lon': lon, 'lat': lat, 'type': 'Point'},
             'properties': station['properties'],
             'analysis': {
-                'avg_temp_day': sum(day_temps) / len(day_temps) if day_temps else None,
-                'avg_temp_night': sum(night_temps) / len(night_temps) if night_temps else None,
-                'day_measurements': len(day_temps),
-                'night_measurements': len(night_temps)
+                'avg_temp_day': day_sum / day_count if day_count else None,
+                'avg_temp_night': night_sum / night_count if night_count else None,
+                'day_measurements': day_count,
+                'night_measurements': night_count
             }
         }
+
+        if len(m_types) > 1:
+            station_result['parameters'] = {t: parameter_stats(*sums[t][station_id]) for t in measured}
         
-        results['stations'].append(station_result)
+        results.append(station_result)
     
-    return results
\ No newline at end of file
+    return results
+
+
+def parameter_stats(day_sum, day_count, night_sum, night_count):
+    return {
+        'avg_day': day_sum / day_count if day_count else None,
+        'avg_night': night_sum / night_count if night_count else None,
+        'day_measurements': day_count,
+        'night_measurements': night_count
+    }
+
+
+def split_m_types(m_type, *columns, m_types):
+    # jeden odczyt wielu parametrow -> kolumny osobno dla kazdego parametru, kolejnosc wierszy bez zmian
+    for t in m_types:
+        mask = m_type == t
+        yield t, [c[mask] for c in columns]
+
+
+@timed('analysis.python_day_night')
+def _python_day_night(mongo_mgr, positions, start_date, end_date, m_types=(DEFAULT_M_TYPE,), variant=DEFAULT_VARIANT):
+    # wszystkie parametry jednym zapytaniem, podzial na parametry dopiero w numpy
+    measurements = mongo_mgr.db.stacje.aggregate([
+        {'$match': {
+            'station_id': {'$in': list(positions)},
+            'm_type': {'$in': list(m_types)},
+            'date': {'$gte': start_date, '$lte': end_date}
+        }},
+        {'$project': MEASUREMENT_COLUMNS}
+    ])
+    s_ids, dates, minutes, values, m_type = measurement_columns(measurements, with_m_type=True)
+
+    table = SolarTable(positions, dates, variant)
+    return {t: station_totals(daily_day_night(table, *columns))
+            for t, columns in split_m_types(m_type, s_ids, dates, minutes, values, m_types=m_types)}
+
+
+@timed('analysis.rollup_day_night')
+def _rollup_day_night(mongo_mgr, positions, start_date, end_date, m_types=(DEFAULT_M_TYPE,), variant=DEFAULT_VARIANT):
+    # sumy z kolekcji dobowe - kilkaset malych dokumentow zamiast surowych pomiarow
+    if variant != DEFAULT_VARIANT:
+        raise ValueError(f"Analysis // Rollups use the '{DEFAULT_VARIANT}' variant; "
+                         f"use 'python' or 'aggregate' for {variant}.")
+    cursor = mongo_mgr.db.dobowe.find(
+        {'station_id': {'$in': list(positions)}, 'm_type': {'$in': list(m_types)},
+         'date': {'$gte': start_date, '$lte': end_date}},
+        {'_id': 0, 'station_id': 1, 'm_type': 1, 'day_sum': 1, 'day_count': 1, 'night_sum': 1, 'night_count': 1}
+    ).sort(ROLLUP_KEY)
+
+    docs = list(cursor)
+    daily = {field: np.array([d[field] for d in docs], dtype=dtype) for field, dtype in ROLLUP_FIELDS}
+    m_type = np.array([d['m_type'] for d in docs], dtype=object)
+
+    return {t: station_totals(dict(zip(daily, columns)))
+            for t, columns in split_m_types(m_type, *daily.values(), m_types=m_types)}
+
+
+@timed('analysis.daily_day_night')
+def daily_day_night(table, s_ids, dates, minutes, values):
+    # sumy dzien/noc na (stacja, dzien), posortowane po stacji i dacie
+    si, di = table.station_index(s_ids), table.date_index(dates)
+    is_day = day_mask(table.sunrise[si, di], table.sunset[si, di], minutes)
+
+    keys, group = np.unique(si * len(table.dates) + di, return_inverse=True)
+    n = len(keys)
+
+    value_min = np.full(n, np.inf)
+    value_max = np.full(n, -np.inf)
+    np.minimum.at(value_min, group, values)
+    np.maximum.at(value_max, group, values)
+
+    return {
+        'station_id': table.station_ids[keys // max(len(table.dates), 1)],
+        'date': table.dates[keys % max(len(table.dates), 1)],
+        'day_sum': np.bincount(group[is_day], weights=values[is_day], minlength=n),
+        'day_count': np.bincount(group[is_day], minlength=n),
+        'night_sum': np.bincount(group[~is_day], weights=values[~is_day], minlength=n),
+        'night_count': np.bincount(group[~is_day], minlength=n),
+        'min': value_min,
+        'max': value_max
+    }
+
+
+def station_totals(daily):
+    # dni musza byc ulozone po (stacja, data), wtedy surowe pomiary i dobowe daja identyczne sumy
+    s_ids, station = np.unique(daily['station_id'], return_inverse=True)
+    n = len(s_ids)
+
+    day_sum = np.bincount(station, weights=daily['day_sum'], minlength=n)
+    day_count = np.bincount(station, weights=daily['day_count'], minlength=n)
+    night_sum = np.bincount(station, weights=daily['night_sum'], minlength=n)
+    night_count = np.bincount(station, weights=daily['night_count'], minlength=n)
+
+    return {
+        int(s_id): (float(day_sum[i]), int(day_count[i]), float(night_sum[i]), int(night_count[i]))
+        for i, s_id in enumerate(s_ids) if day_count[i] + night_count[i]
+    }
+
+
+@timed('analysis.build_rollups')
+def build_rollups(mongo_mgr, redis_mgr, start_date=None, end_date=None, station_batch=500):
+    # przelicza dobowe dla dni z zakresu (domyslnie wszystkich); wywolywane po kazdym wczytaniu
+    date_filter = {}
+    if start_date:
+        date_filter['$gte'] = start_date
+    if end_date:
+        date_filter['$lte'] = end_date
+    query = {'date': date_filter} if date_filter else {}
+
+    station_ids = sorted(mongo_mgr.db.stacje.distinct('station_id', query))
+    m_types = sorted(mongo_mgr.db.stacje.distinct('m_type', query))
+    written = 0
+
+    for i in range(0, len(station_ids), station_batch):
+        stations = redis_mgr.get_stations(station_ids[i:i + station_batch])
+        positions = {s['properties']['ifcid']: s['geometry']['coordinates'] for s in stations}
+        if not positions:
+            continue
+
+        measurements = mongo_mgr.db.stacje.aggregate([
+            {'$match': dict(query, station_id={'$in': list(positions)})},
+            {'$project': MEASUREMENT_COLUMNS}
+        ])
+        s_ids, dates, minutes, values, m_type = measurement_columns(measurements, with_m_type=True)
+        table = SolarTable(positions, dates)
+        # wschody/zachody od razu do kolekcji slonce - tryb aggregate nie liczy ich przy zapytaniu
+        mongo_mgr.store_solar_table(table)
+
+        for t, columns in split_m_types(m_type, s_ids, dates, minutes, values, m_types=m_types):
+            daily = daily_day_night(table, *columns)
+            daily['m_type'] = np.full(len(daily['station_id']), t, dtype=object)
+            written += mongo_mgr.store_rollups(daily)
+
+    print(f'Mongo // {written} daily rollups updated.')
+    return written
+
+
+@timed('analysis.aggregate_day_night')
+def _aggregate_day_night(mongo_mgr, positions, start_date, end_date, m_types=(DEFAULT_M_TYPE,), variant=DEFAULT_VARIANT):
+    # sumy dzien/noc liczy mongo z granicami z kolekcji slonce; dopisywane sa tylko brakujace dni
+    # (wariant sun wypelnia build_rollups, civil i nautical przy pierwszym zapytaniu o dany zakres)
+    match = {
+        'station_id': {'$in': list(positions)},
+        'm_type': {'$in': list(m_types)},
+        'date': {'$gte': start_date, '$lte': end_date}
+    }
+    packed = mongo_mgr.db.stacje.find_one(dict(match, packed={'$exists': True}), {'_id': 1})
+    if packed:
+        raise ValueError("Analysis // Aggregate mode needs the 'documents' schema; use 'python' or 'rollup' for packed data.")
+
+    mongo_mgr.store_solar_table(SolarTable(positions, date_range(start_date, end_date), variant), only_missing=True)
+
+    is_day = '$is_day'
+    pipeline = [
+        {'$match': match},
+        {'$project': {
+            'station_id': 1,
+            'm_type': 1,
+            'values': 1,
+            'solar_key': {'$concat': [{'$toString': '$station_id'}, '|', '$date', '|', variant]}
+        }},
+        {'$lookup': {'from': 'slonce', 'localField': 'solar_key', 'foreignField': '_id', 'as': 'sun'}},
+        {'$unwind': '$sun'},
+        {'$unwind': '$values'},
+        {'$addFields': {'minute': {'$add': [
+            {'$multiply': [{'$toInt': {'$substr': ['$values.time', 0, 2]}}, 60]},
+            {'$toInt': {'$substr': ['$values.time', 3, 2]}}
+        ]}}},
+        # jak solar.day_mask: przy zmierzchu po polnocy noc to tylko okno (sunset, sunrise)
+        {'$addFields': {'is_day': {'$cond': [
+            {'$lte': ['$sun.sunrise', '$sun.sunset']},
+            {'$and': [{'$lte': ['$sun.sunrise', '$minute']}, {'$lte': ['$minute', '$sun.sunset']}]},
+            {'$or': [{'$lte': ['$sun.sunrise', '$minute']}, {'$lte': ['$minute', '$sun.sunset']}]}
+        ]}}},
+        {'$group': {
+            '_id': {'station_id': '$station_id', 'm_type': '$m_type'},
+            'day_sum': {'$sum': {'$cond': [is_day, '$values.value', 0]}},
+            'day_count': {'$sum': {'$cond': [is_day, 1, 0]}},
+            'night_sum': {'$sum': {'$cond': [is_day, 0, '$values.value']}},
+            'night_count': {'$sum': {'$cond': [is_day, 0, 1]}}
+        }}
+    ]
+
+    sums = {t: {} for t in m_types}
+    for doc in mongo_mgr.db.stacje.aggregate(pipeline):
+        sums[doc['_id']['m_type']][doc['_id']['station_id']] = (
+            doc['day_sum'], doc['day_count'], doc['night_sum'], doc['night_count'])
+    return sums
+
+
+DAY_NIGHT_MODES = {
+    'python': _python_day_night,
+    'aggregate': _aggregate_day_night,
+    'rollup': _rollup_day_night
+}
+
+ROLLUP_FIELDS = (
+    ('station_id', np.int64),
+    ('day_sum', np.float64),
+    ('day_count', np.int64),
+    ('night_sum', np.float64),
+    ('night_count', np.int64)
+)
+
+
+# szerokosc przedzialu w minutach dla szeregow czasowych
+RESOLUTIONS = {
+    '10min': 10,
+    'hour': 60,
+    'day': 24 * 60
+}
+
+
+def county_timeseries(mongo_mgr, redis_mgr, county_name, start_date, end_date, resolution='hour', m_type=DEFAULT_M_TYPE,
+                      mode='python'):
+    county = mongo_mgr.db.powiaty.find_one({'properties.name': county_name})
+    station_ids = redis_mgr.get_county_station_ids(county['properties']['id'])
+
+    return {
+        'county': county['properties'],
+        'date_range': {'start': start_date, 'end': end_date},
+        'resolution': resolution,
+        'm_type': m_type,
+        'stations': timeseries_by_station(
+            station_timeseries(mongo_mgr, station_ids, start_date, end_date, resolution, m_type, mode))
+    }
+
+
+@timed('analysis.station_timeseries')
+def station_timeseries(mongo_mgr, station_ids, start_date, end_date, resolution='hour', m_type=DEFAULT_M_TYPE,
+                       mode='python'):
+    # kolumny station_id, time (poczatek przedzialu), min, max, mean, count - posortowane po stacji i czasie
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f'Analysis // Unknown resolution: {resolution}.')
+    if mode not in TIMESERIES_MODES:
+        raise ValueError(f'Analysis // Unknown timeseries mode: {mode}.')
+
+    match = {
+        'station_id': {'$in': [int(s_id) for s_id in station_ids]},
+        'm_type': m_type,
+        'date': {'$gte': start_date, '$lte': end_date}
+    }
+    return TIMESERIES_MODES[mode](mongo_mgr, match, RESOLUTIONS[resolution])
+
+
+def _python_timeseries(mongo_mgr, match, step):
+    measurements = mongo_mgr.db.stacje.aggregate([{'$match': match}, {'$project': MEASUREMENT_COLUMNS}])
+    return bucket_columns(*measurement_columns(measurements), step)
+
+
+def _aggregate_timeseries(mongo_mgr, match, step):
+    # kubelki liczone w mongo - do klienta trafia jeden dokument na przedzial zamiast kazdego pomiaru
+    if mongo_mgr.db.stacje.find_one(dict(match, packed={'$exists': True}), {'_id': 1}):
+        raise ValueError("Analysis // Aggregate mode needs the 'documents' schema; use 'python' for packed data.")
+
+    pipeline = [
+        {'$match': match},
+        {'$project': {'station_id': 1, 'date': 1, 'values': 1}},
+        {'$unwind': '$values'},
+        {'$addFields': {'minute': {'$add': [
+            {'$multiply': [{'$toInt': {'$substr': ['$values.time', 0, 2]}}, 60]},
+            {'$toInt': {'$substr': ['$values.time', 3, 2]}}
+        ]}}},
+        {'$group': {
+            '_id': {
+                'station_id': '$station_id',
+                'date': '$date',
+                'bucket': {'$subtract': ['$minute', {'$mod': ['$minute', step]}]}
+            },
+            'min': {'$min': '$values.value'},
+            'max': {'$max': '$values.value'},
+            'sum': {'$sum': '$values.value'},
+            'count': {'$sum': 1}
+        }},
+        {'$sort': {'_id.station_id': 1, '_id.date': 1, '_id.bucket': 1}}
+    ]
+    docs = list(mongo_mgr.db.stacje.aggregate(pipeline))
+
+    dates = np.array([d['_id']['date'] for d in docs], dtype='datetime64[D]')
+    buckets = np.array([d['_id']['bucket'] for d in docs], dtype=np.int64).astype('timedelta64[m]')
+    count = np.array([d['count'] for d in docs], dtype=np.int64)
+    return {
+        'station_id': np.array([d['_id']['station_id'] for d in docs], dtype=np.int64),
+        'time': dates.astype('datetime64[m]') + buckets,
+        'min': np.array([d['min'] for d in docs], dtype=np.float64),
+        'max': np.array([d['max'] for d in docs], dtype=np.float64),
+        'mean': np.array([d['sum'] for d in docs], dtype=np.float64) / np.maximum(count, 1),
+        'count': count
+    }
+
+
+TIMESERIES_MODES = {
+    'python': _python_timeseries,
+    'aggregate': _aggregate_timeseries
+}
+
+
+@timed('analysis.bucket_columns')
+def bucket_columns(s_ids, dates, minutes, values, step):
+    # pomiary -> przedzialy (stacja, poczatek przedzialu) jednym sortowaniem i reduceat
+    times = dates.astype('datetime64[m]') + (minutes // step * step).astype('timedelta64[m]')
+    order = np.lexsort((times, s_ids))
+    s_ids, times, values = s_ids[order], times[order], values[order]
+
+    if not s_ids.size:
+        empty = np.empty(0, dtype=np.float64)
+        return {'station_id': s_ids, 'time': times, 'min': empty, 'max': empty, 'mean': empty,
+                'count': np.empty(0, dtype=np.int64)}
+
+    starts = np.flatnonzero(np.r_[True, (s_ids[1:] != s_ids[:-1]) | (times[1:] != times[:-1])])
+    count = np.diff(np.r_[starts, s_ids.size])
+    return {
+        'station_id': s_ids[starts],
+        'time': times[starts],
+        'min': np.minimum.reduceat(values, starts),
+        'max': np.maximum.reduceat(values, starts),
+        'mean': np.add.reduceat(values, starts) / count,
+        'count': count
+    }
+
+
+def timeseries_by_station(columns):
+    # kolumny -> {stacja: listy gotowe do json i wykresu}
+    stations = {}
+    s_ids = columns['station_id']
+    bounds = np.flatnonzero(np.r_[True, s_ids[1:] != s_ids[:-1], True]) if s_ids.size else []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        stations[int(s_ids[a])] = {
+            'time': np.datetime_as_string(columns['time'][a:b], unit='m').tolist(),
+            'min': columns['min'][a:b].tolist(),
+            'max': columns['max'][a:b].tolist(),
+            'mean': columns['mean'][a:b].tolist(),
+            'count': columns['count'][a:b].tolist()
+        }
+    return stations
+
+@timed('analysis.measurement_columns')
+def measurement_columns(measurements, with_m_type=False):
+    # dokumenty po projekcji MEASUREMENT_COLUMNS -> kolumny numpy, bez slownika na kazdy pomiar;
+    # with_m_type dokleja piata kolumne z parametrem
+    s_ids, dates, types, counts, times, values = [], [], [], [], [], []
+    packed_ids, packed_dates, packed_types, packed, masks = [], [], [], [], []
+    for m in measurements:
+        if 'packed' in m:
+            packed_ids.append(m['station_id'])
+            packed_dates.append(m['date'])
+            packed_types.append(m.get('m_type', DEFAULT_M_TYPE))
+            packed.append(m['packed'])
+            masks.append(m['mask'])
+            continue
+
+        m_times = m.get('time') or []
+        s_ids.append(m['station_id'])
+        dates.append(m['date'])
+        types.append(m.get('m_type', DEFAULT_M_TYPE))
+        counts.append(len(m_times))
+        times.extend(m_times)
+        values.extend(m.get('value') or [])
+
+    s_ids = np.repeat(np.array(s_ids, dtype=np.int64), counts)
+    dates = np.repeat(np.array(dates, dtype='datetime64[D]'), counts)
+    types = np.repeat(np.array(types, dtype=object), counts)
+    minutes = time_to_minutes(times)
+    values = np.array(values, dtype=np.float64)
+    if not packed:
+        return (s_ids, dates, minutes, values, types) if with_m_type else (s_ids, dates, minutes, values)
+
+    # bufory kolejnych dni sklejone raz i czytane bez parsowania przez np.frombuffer
+    slots = np.frombuffer(b''.join(packed), dtype='<f4').reshape(-1, SLOTS_PER_DAY)
+    present = np.unpackbits(np.frombuffer(b''.join(masks), dtype=np.uint8)).reshape(-1, SLOTS_PER_DAY).astype(bool)
+    per_day = present.sum(axis=1)
+
+    columns = (np.concatenate([s_ids, np.repeat(np.array(packed_ids, dtype=np.int64), per_day)]),
+               np.concatenate([dates, np.repeat(np.array(packed_dates, dtype='datetime64[D]'), per_day)]),
+               np.concatenate([minutes, np.broadcast_to(SLOT_MINUTES, slots.shape)[present]]),
+               np.concatenate([values, slots[present].astype(np.float64)]))
+    if with_m_type:
+        columns += (np.concatenate([types, np.repeat(np.array(packed_types, dtype=object), per_day)]),)
+    return columns
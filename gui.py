@@ -3,9 +3,11 @@ from tkinter import ttk, messagebox, scrolledtext
 import webbrowser
 import os
 import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from databases import MongoManager, RedisManager, analyze_county_day_night, get_date_range, get_counties_with_station_count
-from mapka import map_creator
+from databases import MongoManager, RedisManager, get_date_range, get_counties_with_station_count
+from cache import AnalysisCache
 
 class AnalysisGUI:
     def __init__(self, root):
@@ -13,14 +15,66 @@ class AnalysisGUI:
         self.root.title("Analiza Pomiarów Meteorologicznych")
         self.root.geometry("700x600")
         
-        self.mongo = MongoManager()
-        self.redis = RedisManager()
-        
-        self.county_counts = get_counties_with_station_count(self.mongo, self.redis)
-        self.counties = [f"{name} [{count}]" for name, count in sorted(self.county_counts.items()) if count > 0]
-        self.min_date, self.max_date = get_date_range(self.mongo)
+        self.mongo = self.redis = self.cache = None
+        self.counties, self.available_dates = [], []
+
+        # jeden watek roboczy: zapytania i mapa ida po kolei, Tk dostaje wyniki przez kolejke
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.events = queue.Queue()
+        self.request_id = 0
+        self.current = None
         
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.after(50, self._poll_events)
+
+        self._set_busy("Ładowanie listy powiatów...")
+        self.executor.submit(self._load_initial_data)
+
+    def _post(self, callback, *args):
+        self.events.put((callback, args))
+
+    def _poll_events(self):
+        while not self.events.empty():
+            callback, args = self.events.get_nowait()
+            callback(*args)
+        self.root.after(50, self._poll_events)
+
+    def _load_initial_data(self):
+        try:
+            mongo, redis = MongoManager(), RedisManager()
+            county_counts = get_counties_with_station_count(mongo, redis)
+            min_date, max_date = get_date_range(mongo)
+        except Exception as e:
+            self._post(self._show_error, self.request_id, f"Nie udało się wczytać danych: {e}")
+            return
+        self._post(self._on_data_loaded, mongo, redis, county_counts, min_date, max_date)
+
+    def _on_data_loaded(self, mongo, redis, county_counts, min_date, max_date):
+        self.mongo, self.redis = mongo, redis
+        self.cache = AnalysisCache(mongo, redis)
+        self.county_counts = county_counts
+        self.counties = [f"{name} [{count}]" for name, count in sorted(county_counts.items()) if count > 0]
+        self.min_date, self.max_date = min_date, max_date
+        self.available_dates = self._generate_date_range()
+
+        for combo, values, idx in ((self.county_combo, self.counties, 0),
+                                   (self.start_date, self.available_dates, 0),
+                                   (self.end_date, self.available_dates, len(self.available_dates) - 1)):
+            combo['values'] = values
+            if values:
+                combo.current(idx)
+
+        self.analysis_button.state(['!disabled'])
+        self._set_idle(f"Wczytano {len(self.counties)} powiatów.")
+
+    def _set_busy(self, message):
+        self.status.set(message)
+        self.progress.start(10)
+
+    def _set_idle(self, message=""):
+        self.status.set(message)
+        self.progress.stop()
         
     def create_widgets(self):
         main_frame = ttk.Frame(self.root, padding=10)
@@ -41,8 +95,8 @@ class AnalysisGUI:
             return combo
         
         self.county_combo = add_combo_row(analysis_frame, 0, "Powiat:", self.counties)
+        self.county_combo.bind("<<ComboboxSelected>>", self._on_county_changed)
         
-        self.available_dates = self._generate_date_range()
         self.start_date = add_combo_row(analysis_frame, 1, "Data od:", self.available_dates, 0)
         self.end_date = add_combo_row(analysis_frame, 2, "Data do:", self.available_dates, 
                                       len(self.available_dates) - 1 if self.available_dates else 0)
@@ -50,8 +104,10 @@ class AnalysisGUI:
         button_frame = ttk.Frame(analysis_frame)
         button_frame.grid(row=3, columnspan=2, pady=10)
         
-        ttk.Button(button_frame, text="Wykonaj Analizę i Mapę", 
-                  command=self.run_analysis).pack(side="left", padx=5)
+        self.analysis_button = ttk.Button(button_frame, text="Wykonaj Analizę i Mapę",
+                                          command=self.run_analysis)
+        self.analysis_button.pack(side="left", padx=5)
+        self.analysis_button.state(['disabled'])
         ttk.Button(button_frame, text="Otwórz Mapę", 
                   command=self.open_map).pack(side="left", padx=5)
         
@@ -61,6 +117,13 @@ class AnalysisGUI:
         self.results_text = scrolledtext.ScrolledText(results_frame, width=80, height=22, 
                                                       font=('Courier', 9))
         self.results_text.grid(sticky="nsew")
+
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=3, columnspan=2, sticky="ew")
+        self.status = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.status).pack(side="left", padx=5)
+        self.progress = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+        self.progress.pack(side="right", padx=5)
         
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
@@ -69,6 +132,8 @@ class AnalysisGUI:
         results_frame.rowconfigure(0, weight=1)
     
     def _generate_date_range(self):     
+        if not self.min_date or not self.max_date:
+            return []
         min_dt = datetime.strptime(self.min_date, '%Y-%m-%d')
         max_dt = datetime.strptime(self.max_date, '%Y-%m-%d')
         dates = []
@@ -93,20 +158,63 @@ class AnalysisGUI:
         county = self.county_combo.get().split('[')[0].strip()
         start, end = self.start_date.get().strip(), self.end_date.get().strip()
         
+        request_id = self._supersede()
         self._update_results("Wykonywanie analizy...\n\n")
-        self.root.update()
-        
-        result = analyze_county_day_night(self.mongo, self.redis, county, start, end)
-        
+        self._set_busy("Wykonywanie analizy...")
+
+        self.current = self.executor.submit(self._analysis_job, request_id, county, start, end)
+
+    def _supersede(self):
+        # nowe zapytanie uniewaznia poprzednie; jesli jeszcze czeka w kolejce, w ogole nie ruszy
+        self.request_id += 1
+        if self.current is not None:
+            self.current.cancel()
+        return self.request_id
+
+    def _on_county_changed(self, event=None):
+        if self.current is not None and not self.current.done():
+            self._supersede()
+            self._set_idle("Anulowano poprzednią analizę.")
+
+    def _analysis_job(self, request_id, county, start, end):
+        try:
+            result = self.cache.analyze(county, start, end)
+            if request_id != self.request_id:
+                return
+            self._post(self._show_analysis, request_id, result)
+
+            if request_id != self.request_id:
+                return
+            # folium ladowany przy pierwszej mapie, a nie przy starcie okna
+            from mapka import map_creator
+            map_creator(result)
+            self._post(self._on_map_ready, request_id)
+        except Exception as e:
+            self._post(self._show_error, request_id, f"Analiza nie powiodła się: {e}")
+
+    def _show_analysis(self, request_id, result):
+        if request_id != self.request_id:
+            return
+
         output = self._format_results(result)
         output += self._format_stations(result['stations'])
         output += self._format_summary(result['stations'])
         
         self._update_results(output)
         self.results_text.insert("end", "Generowanie mapy...\n")
-        self.root.update()
-        
-        map_creator(result)
+        self._set_busy("Generowanie mapy...")
+
+    def _on_map_ready(self, request_id):
+        if request_id != self.request_id:
+            return
+        self.results_text.insert("end", "Mapa gotowa.\n")
+        self._set_idle("Gotowe.")
+
+    def _show_error(self, request_id, message):
+        if request_id != self.request_id:
+            return
+        self._set_idle()
+        messagebox.showerror("Błąd", message)
     
     def _format_stations(self, stations):
         output = ""
@@ -140,6 +248,11 @@ class AnalysisGUI:
         url = f"file://{map_path}?t={int(time.time())}"
         webbrowser.open(url, new=2)
 
+    def close(self):
+        self.request_id += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
 
 def main_gui():
     root = tk.Tk()
@@ -1,13 +1,73 @@
-import geopandas as gpd
-import pandas as pd
-from databases import *
-from astral import LocationInfo
-from astral.sun import sun
-import folium
-from mapka import map_creator
+import os
+import glob
+import shutil
+import itertools
+import hashlib
+import numpy as np
+from databases import (DEFAULT_M_TYPE, MEASUREMENT_COLUMNS, MEASUREMENT_SCHEMAS, RESOLUTIONS, MongoManager, RedisManager,
+                       bucket_columns, build_rollups, county_key, daily_day_night, measurement_columns, normalize_m_types,
+                       split_m_types, station_results, station_totals, timeseries_by_station)
+from metrics import METRICS, timed
+from solar import DEFAULT_VARIANT, SolarTable, day_mask
+
+CACHE_DIR = 'cache'
+
+def frame_schema():
+    # typy kolumn measurement_frame; kategorie dat zmieniaja sie miedzy porcjami, wiec indeksy zawsze int32
+    import pyarrow as pa
+    return pa.schema([
+        ('station_id', pa.int32()),
+        ('m_type', pa.dictionary(pa.int32(), pa.string())),
+        ('date', pa.dictionary(pa.int32(), pa.string())),
+        ('minute', pa.int16()),
+        ('value', pa.float32()),
+        ('is_day', pa.bool_())
+    ])
+
+@timed('data.prepare_data')
+def prepare_data(stations_path, boundary_path, cache_dir=CACHE_DIR):
+    # wynik sjoin trzymany w GeoParquet pod suma kontrolna plikow wejsciowych
+    import geopandas as gpd
+    checksum = file_checksum(stations_path, *shapefile_parts(boundary_path))[:16]
+    stations_cache = os.path.join(cache_dir, f'stacje_{checksum}.parquet')
+    counties_cache = os.path.join(cache_dir, f'powiaty_{checksum}.parquet')
+
+    if os.path.exists(stations_cache) and os.path.exists(counties_cache):
+        joined = gpd.read_parquet(stations_cache)
+        boundaries = gpd.read_parquet(counties_cache)
+        print('Data // Stations and counties loaded from cache.')
+    else:
+        joined, boundaries = _join_stations(stations_path, boundary_path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            joined.to_parquet(stations_cache)
+            boundaries.to_parquet(counties_cache)
+        except Exception as e:
+            print(f'Data // Failed to cache joined data: {e}.')
+
+    counties_json = list(_features(boundaries))
+    stations_json = list(_features(joined))
 
-def prepare_data(stations_path, boundary_path):
+    for feature in stations_json:
+        props = feature['properties']
+        props['powiatinfo'] = {
+            'nazwa': props.get('nazwa_powiatu'),
+            'id': county_key(props.get('id_powiatu'))}
+        props.pop('nazwa_powiatu', None)
+        props.pop('id_powiatu', None)
+        props.pop('index_right', None)
+
+    return stations_json, counties_json
+
+@timed('data.prepare_regions')
+def prepare_regions(boundary_path):
+    import geopandas as gpd
+    regions = gpd.read_file(boundary_path).to_crs(epsg=4326)
+    return list(_features(regions))
 
+def _join_stations(stations_path, boundary_path):
+    # geopandas ladowany dopiero przy wczytywaniu danych przestrzennych - samo zapytanie go nie potrzebuje
+    import geopandas as gpd
     stations = gpd.read_file(stations_path)
     boundaries = gpd.read_file(boundary_path)
 
@@ -17,119 +77,421 @@ def prepare_data(stations_path, boundary_path):
     # if stations.crs != boundaries.crs:
     #     boundaries = boundaries.to_crs(stations.crs)
 
-    counties_json = json.loads(boundaries.to_json(default=str))['features']
-
     boundaries_subset = boundaries[['geometry', 'name', 'id']].rename(
         columns={'name': 'nazwa_powiatu', 'id': 'id_powiatu'})
 
     joined = gpd.sjoin(stations, boundaries_subset, how='left', predicate='within')
-    stations_json = json.loads(joined.to_json(default=str))['features']
+    return joined, boundaries
 
-    for feature in stations_json:
+def _features(gdf):
+    # slowniki GeoJSON prosto z ramki, bez to_json + json.loads
+    for feature in gdf.iterfeatures(na='null'):
         props = feature['properties']
-        props['powiatinfo'] = {
-            'nazwa': props.get('nazwa_powiatu'),
-            'id': props.get('id_powiatu')}
-        props.pop('nazwa_powiatu', None)
-        props.pop('id_powiatu', None)
-        props.pop('index_right', None)
-
-    return stations_json, counties_json
+        for key, value in props.items():
+            if isinstance(value, np.generic):
+                props[key] = value.item()
+            elif value is not None and not isinstance(value, (str, int, float, bool)):
+                props[key] = str(value)
+        yield feature
+
+def expand_paths(paths):
+    # pojedyncza sciezka, lista albo wzorzec glob, np. Dane/B00300S_*.csv
+    if isinstance(paths, str):
+        paths = [paths]
+    return [p for pattern in paths for p in (sorted(glob.glob(pattern)) or [pattern])]
+
+def iter_csv_documents(csv_paths, chunksize=500_000):
+    # dokumenty (stacja, parametr, dzien) budowane porcjami; pliki IMGW sa ulozone stacjami,
+    # wiec tylko grupa ostatniego wiersza porcji (w kolejnosci pliku) moze ciagnac sie do nastepnej
+    import pandas as pd
+    for csv_path in expand_paths(csv_paths):
+        carry = None
+        emitted = set()
+        reader = pd.read_csv(csv_path, sep=';', names=['station_id', 'm_type', 'date', 'values'],
+                             dtype={'station_id': np.int64, 'm_type': str, 'date': str, 'values': np.float64},
+                             chunksize=chunksize)
+
+        for chunk in reader:
+            chunk = _split_dates(chunk)
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+
+            last = chunk.iloc[-1]
+            tail = ((chunk['station_id'] == last['station_id']) & (chunk['m_type'] == last['m_type'])
+                    & (chunk['date_day'] == last['date_day'])).to_numpy()
+            carry = chunk[tail]
+            yield from _chunk_documents(_group_chunk(csv_path, chunk[~tail], emitted))
+
+        if carry is not None:
+            yield from _chunk_documents(_group_chunk(csv_path, carry, emitted))
+
+def _split_dates(chunk):
+    import pandas as pd
+    dates = pd.to_datetime(chunk['date'])
+    return chunk.assign(date_day=dates.dt.strftime('%Y-%m-%d'), date_time=dates.dt.strftime('%H:%M'))
+
+def _group_chunk(csv_path, chunk, emitted):
+    # sortowanie tylko w obrebie gotowej czesci porcji; grupa wydana wczesniej nie moze wrocic,
+    # bo upsert nadpisalby jej pierwsza czesc
+    chunk = chunk.sort_values(['station_id', 'm_type', 'date_day'], kind='stable', ignore_index=True)
+    if chunk.empty:
+        return chunk
+
+    starts = _group_starts(chunk)
+    keys = list(zip(chunk['station_id'].to_numpy()[starts].tolist(), chunk['m_type'].to_numpy()[starts].tolist(),
+                    chunk['date_day'].to_numpy()[starts].tolist()))
+    repeated = next((key for key in keys if key in emitted), None)
+    if repeated:
+        raise ValueError(f'Data // {csv_path}: rows for station {repeated[0]}, {repeated[1]}, {repeated[2]} '
+                         f'are not contiguous; sort the file by station, parameter and time.')
+    emitted.update(keys)
+    return chunk
+
+def _group_starts(chunk):
+    s_ids = chunk['station_id'].to_numpy()
+    m_types = chunk['m_type'].to_numpy()
+    days = chunk['date_day'].to_numpy()
+    change = (s_ids[1:] != s_ids[:-1]) | (m_types[1:] != m_types[:-1]) | (days[1:] != days[:-1])
+    return np.concatenate(([0], np.flatnonzero(change) + 1))
+
+def _chunk_documents(chunk):
+    if chunk.empty:
+        return
+
+    s_ids = chunk['station_id'].to_numpy()
+    m_types = chunk['m_type'].to_numpy()
+    days = chunk['date_day'].to_numpy()
+    times = chunk['date_time'].tolist()
+    values = chunk['values'].tolist()
+
+    starts = _group_starts(chunk)
+    ends = np.append(starts[1:], len(chunk))
+
+    for a, b in zip(starts.tolist(), ends.tolist()):
+        yield {
+            'station_id': int(s_ids[a]),
+            'm_type': str(m_types[a]),
+            'date': str(days[a]),
+            'values': [{'time': t, 'value': v} for t, v in zip(times[a:b], values[a:b])]
+        }
 
+@timed('data.prepare_csv')
 def prepare_csv(csv_path):
-    df = pd.read_csv(csv_path, sep=';', names=['station_id', 'm_type', 'date', 'values'])
-
-    df['date'] = pd.to_datetime(df['date'])
-    df['date_day'] = df['date'].dt.date.astype(str)
-    df['date_time'] = df['date'].dt.strftime('%H:%M')
-
-    docs = []
-
-    for (s_id, m_t, d_day), group in df.groupby(['station_id', 'm_type', 'date_day']):
-        measurements = []
-        for _, row in group.iterrows():
-            measurements.append({
-                'time': str(row['date_time']),
-                'value': float(row['values'])
-            })
-
-        doc = {
-            'station_id': int(s_id),
-            'm_type': str(m_t),
-            'date': str(d_day),
-            'values': measurements
-        }
+    return list(iter_csv_documents(csv_path))
+
+def file_checksum(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def shapefile_parts(shp_path):
+    base = os.path.splitext(shp_path)[0]
+    return [p for p in (base + ext for ext in ('.shp', '.shx', '.dbf', '.prj')) if os.path.exists(p)]
+
+@timed('data.load_measurements')
+def load_measurements(mongo_mgr, measurement_path):
+    # tylko pliki, ktorych suma kontrolna nie jest jeszcze w manifescie; zwraca wczytane dni.
+    # Plik o tej samej sciezce, rozmiarze i mtime co w manifescie nie jest nawet czytany
+    loaded_dates = set()
+    for csv_path in expand_paths(measurement_path):
+        stat = os.stat(csv_path)
+        size, mtime = stat.st_size, stat.st_mtime_ns
+        if mongo_mgr.is_file_ingested(csv_path, size, mtime):
+            print(f'Mongo // {csv_path} unchanged since last load, skipping.')
+            continue
+
+        checksum = file_checksum(csv_path)
+        if mongo_mgr.is_ingested(checksum):
+            mongo_mgr.update_ingested_file(checksum, csv_path, size, mtime)
+            print(f'Mongo // {csv_path} already ingested, skipping.')
+            continue
+
+        written = mongo_mgr.upsert_measurements(_track_dates(iter_csv_documents(csv_path), loaded_dates))
+        mongo_mgr.mark_ingested(checksum, csv_path, 'measurements', written, size, mtime)
+        print(f'Mongo // {csv_path}: {written} documents upserted.')
+    return loaded_dates
+
+def _track_dates(docs, dates):
+    for doc in docs:
+        dates.add(doc['date'])
+        yield doc
+
+class MongoRedisBackend:
+    def __init__(self, mongo_mgr, redis_mgr):
+        self.mongo = mongo_mgr
+        self.redis = redis_mgr
+
+    def _pipeline(self, station_ids=None, start_date=None, end_date=None, m_types=None):
+        query = {}
+        if station_ids is not None:
+            query['station_id'] = {'$in': [int(s_id) for s_id in station_ids]}
+        if m_types is not None:
+            query['m_type'] = {'$in': list(m_types)}
+        if start_date or end_date:
+            query['date'] = {k: v for k, v in (('$gte', start_date), ('$lte', end_date)) if v}
+        return ([{'$match': query}] if query else []) + [{'$project': MEASUREMENT_COLUMNS}]
+
+    def measurement_columns(self, station_ids=None, start_date=None, end_date=None, m_types=None):
+        return measurement_columns(self.mongo.db.stacje.aggregate(
+            self._pipeline(station_ids, start_date, end_date, m_types)), with_m_type=True)
+
+    def iter_measurement_columns(self, chunk_size, station_ids=None, start_date=None, end_date=None, m_types=None):
+        # kursor czytany porcjami po chunk_size dni stacji, w pamieci jest tylko biezaca porcja
+        cursor = self.mongo.db.stacje.aggregate(self._pipeline(station_ids, start_date, end_date, m_types),
+                                                batchSize=min(chunk_size, 10_000))
+        while True:
+            docs = list(itertools.islice(cursor, chunk_size))
+            if not docs:
+                return
+            yield measurement_columns(docs, with_m_type=True)
+
+    def positions(self, station_ids=None):
+        # dokladne wspolrzedne z dokumentow stacji, jak w analizie powiatu (GEOPOS zwraca geohash)
+        if station_ids is None:
+            station_ids = self.redis.db.zrange('station_points', 0, -1)
+        stations = self.redis.get_stations([int(s_id) for s_id in station_ids])
+        return {s['properties']['ifcid']: tuple(s['geometry']['coordinates'][:2]) for s in stations}
+
+    def county_stations(self, county_name):
+        county = self.mongo.db.powiaty.find_one({'properties.name': county_name}, {'_id': 0})
+        if county is None:
+            raise KeyError(f'Mongo // Unknown county: {county_name}.')
+        return county, self.redis.get_county_stations(county['properties']['id'])
 
-        docs.append(doc)
-    return docs
 
 class AnalysisManager:
-    def __init__(self, mongo_mgr, redis_mgr):
+    # backend: MongoRedisBackend albo ParquetStore - oba daja te same kolumny, stacje i powiaty;
+    # m_types=None w ramkach oznacza wszystkie parametry, w analizie powiatu - temperature powietrza
+    def __init__(self, mongo_mgr=None, redis_mgr=None, backend=None):
         self.mongo = mongo_mgr
         self.redis = redis_mgr
+        self.backend = backend if backend is not None else MongoRedisBackend(mongo_mgr, redis_mgr)
 
-    def prepare_dataframe(self):
-        measurements = list(self.mongo.db.stacje.find({}))
+    @timed('analysis.prepare_dataframe')
+    def prepare_dataframe(self, start_date=None, end_date=None, m_types=None, variant=DEFAULT_VARIANT):
+        # wszystkie parametry jednym odczytem, parametr w kolumnie m_type
+        columns = self.backend.measurement_columns(None, start_date, end_date, m_types)
 
-        if not measurements:
+        if not columns[0].size:
+            import pandas as pd
             print('Analysis // No data found.')
             return pd.DataFrame()
 
-        daytime = []
-        for doc in measurements:
-            s_id = str(doc['station_id'])
-            date = str(doc['date'])
+        positions = self.backend.positions(np.unique(columns[0]).tolist())
+        return measurement_frame(*columns, positions, variant)
+
+    def iter_dataframe(self, chunk_size=10_000, start_date=None, end_date=None, m_types=None, variant=DEFAULT_VARIANT):
+        # ramki po chunk_size dni stacji; pozycje wszystkich stacji pobierane raz, przed odczytem pomiarow
+        positions = self.backend.positions()
+
+        for columns in self.backend.iter_measurement_columns(chunk_size, None, start_date, end_date, m_types):
+            chunk_positions = {s_id: positions[s_id] for s_id in np.unique(columns[0]).tolist() if s_id in positions}
+            if chunk_positions:
+                yield measurement_frame(*columns, chunk_positions, variant)
+
+    @timed('analysis.export_dataframe')
+    def export_dataframe(self, path, chunk_size=10_000, start_date=None, end_date=None, m_types=None,
+                         variant=DEFAULT_VARIANT):
+        # zapis porcjami prosto do pliku - pamiec zalezy od chunk_size, a nie od wielkosci kolekcji
+        rows = 0
+        writer = None
+        try:
+            for chunk in self.iter_dataframe(chunk_size, start_date, end_date, m_types, variant):
+                if path.endswith('.csv'):
+                    chunk.to_csv(path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+                else:
+                    if writer is None:
+                        import pyarrow as pa
+                        import pyarrow.parquet as pq
+                        schema = frame_schema()
+                        writer = pq.ParquetWriter(path, schema, compression='zstd')
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        print(f'Analysis // {rows} rows saved to {path}.')
+        return rows
+
+    @timed('analysis.analyze_county')
+    def analyze_county(self, county_name, start_date, end_date, m_types=None, variant=DEFAULT_VARIANT):
+        # ten sam wynik co analyze_county_day_night w trybie python
+        m_types = normalize_m_types(m_types)
+        county, stations = self.backend.county_stations(county_name)
+        positions = {s['properties']['ifcid']: s['geometry']['coordinates'] for s in stations}
+        s_ids, dates, minutes, values, m_type = self.backend.measurement_columns(
+            list(positions), start_date, end_date, m_types)
+
+        table = SolarTable(positions, dates, variant)
+        sums = {t: station_totals(daily_day_night(table, *columns))
+                for t, columns in split_m_types(m_type, s_ids, dates, minutes, values, m_types=m_types)}
+
+        return {
+            'county': county['properties'],
+            'county_geometry': county['geometry'],
+            'date_range': {'start': start_date, 'end': end_date},
+            'stations': station_results(stations, sums, m_types)
+        }
+
+    @timed('analysis.timeseries')
+    def timeseries(self, county_name, start_date, end_date, resolution='hour', m_type=DEFAULT_M_TYPE):
+        # ten sam wynik co county_timeseries w trybie python
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f'Analysis // Unknown resolution: {resolution}.')
+
+        county, stations = self.backend.county_stations(county_name)
+        s_ids, dates, minutes, values, _ = self.backend.measurement_columns(
+            [s['properties']['ifcid'] for s in stations], start_date, end_date, [m_type])
+
+        return {
+            'county': county['properties'],
+            'date_range': {'start': start_date, 'end': end_date},
+            'resolution': resolution,
+            'm_type': m_type,
+            'stations': timeseries_by_station(bucket_columns(s_ids, dates, minutes, values, RESOLUTIONS[resolution]))
+        }
 
-            position = self.redis.db.geopos('station_points', s_id)
-            if not position or position[0] is None:
-                continue
 
-            ## ASTRAl ##
-            lon, lat = position[0]
-            loc = LocationInfo(latitude=lat, longitude=lon)
-            s = sun(loc.observer, date=pd.to_datetime(date))
-            sunrise = s['sunrise'].strftime('%H:%M')
-            sunset = s['sunset'].strftime('%H:%M')
+@timed('analysis.measurement_frame')
+def measurement_frame(station_ids, dates, minutes, values, m_types, positions, variant=DEFAULT_VARIANT):
+    import pandas as pd
+    known = np.isin(station_ids, list(positions))
+    station_ids, dates, minutes, values = station_ids[known], dates[known], minutes[known], values[known]
+    m_types = m_types[known]
+
+    ## ASTRAL ##
+    table = SolarTable(positions, dates, variant)
+    si, di = table.station_index(station_ids), table.date_index(dates)
+
+    return pd.DataFrame({
+        'station_id': station_ids.astype(np.int32),
+        'm_type': pd.Categorical(m_types),
+        'date': pd.Categorical.from_codes(di, categories=table.dates.astype(str)),
+        'minute': minutes.astype(np.int16),
+        'value': values.astype(np.float32),
+        'is_day': day_mask(table.sunrise[si, di], table.sunset[si, di], minutes)
+    })
+
+@timed('data.export_parquet')
+def export_parquet(mongo_mgr, redis_mgr, store, dates=None, stations_changed=False):
+    # kopia danych do Parquet dla analiz bez Mongo i Redisa; pusty magazyn dostaje wszystkie miesiace
+    if stations_changed or not store.has_stations():
+        s_ids = sorted(int(s_id) for s_id in redis_mgr.db.zrange('station_points', 0, -1))
+        counties = list(mongo_mgr.db.powiaty.find({}, {'_id': 0}))
+        store.write_stations(redis_mgr.get_stations(s_ids), counties)
+
+    if store.has_measurements():
+        months = sorted({d[:7] for d in dates or ()})
+    else:
+        months = sorted({d[:7] for d in mongo_mgr.db.stacje.distinct('date')})
+
+    written = 0
+    for month in months:
+        written += store.write_measurements(*MongoRedisBackend(mongo_mgr, redis_mgr).measurement_columns(
+            None, f'{month}-01', f'{month}-31'))
+    print(f'Parquet // {written} measurements in {len(months)} monthly partitions saved.')
+
+def main(stations_path, measurement_path, boundary_path, voivodeship_path=None, full_reload=False, schema='documents',
+         parquet_root=None, export_path=None):
+    m = MongoManager(schema=schema)
+    r = RedisManager()
 
-            for m in doc['values']:
-                m_time = m['time']
+    if full_reload:
+        m.db.stacje.delete_many({})
+        m.db.manifest.delete_many({})
+        m.db.dobowe.delete_many({})
+        m.db.slonce.delete_many({})
 
-                is_day = sunrise <= m_time <= sunset
+    boundary_checksum = file_checksum(*shapefile_parts(boundary_path))
+    counties_changed = not m.is_ingested(boundary_checksum)
+    redis_empty = not r.db.exists('station_points')
 
-                daytime.append({
-                    'station_id': int(s_id),
-                    'date': date,
-                    'time': m_time,
-                    'is_day': True if is_day else False,
-                    'value': m['value']
-                })
+    if counties_changed or redis_empty:
+        station_data, county_data = prepare_data(stations_path, boundary_path)
 
-        return pd.DataFrame(daytime)
+        if counties_changed:
+            m.replace_counties(county_data)
+            m.mark_ingested(boundary_checksum, boundary_path, 'counties', len(county_data))
 
-def main(stations_path, measurement_path, boundary_path):
-    m = MongoManager()
-    r = RedisManager()
+        # przypisanie stacji do powiatow zalezy od granic, wiec indeks w Redisie idzie razem z nimi
+        r.insert_data(station_data)
+        # pozycje stacji mogly sie zmienic - wschody/zachody liczone od nowa
+        m.db.slonce.delete_many({})
 
-    mongo_empty = m.db.stacje.count_documents({}) == 0 or m.db.powiaty.count_documents({}) == 0
-    redis_empty = not r.db.exists('station_points')
+    if voivodeship_path:
+        voivodeship_checksum = file_checksum(*shapefile_parts(voivodeship_path))
+        if not m.is_ingested(voivodeship_checksum):
+            voivodeship_data = prepare_regions(voivodeship_path)
+            m.replace_voivodeships(voivodeship_data)
+            m.mark_ingested(voivodeship_checksum, voivodeship_path, 'voivodeships', len(voivodeship_data))
 
-    if mongo_empty or redis_empty:
-        measurement_data = prepare_csv(measurement_path)
-        station_data, county_data = prepare_data(stations_path, boundary_path)
+    loaded_dates = load_measurements(m, measurement_path)
+
+    if loaded_dates or counties_changed or redis_empty:
+        r.update_county_counts(m.db.stacje.distinct('station_id'))
+
+    if redis_empty or m.db.dobowe.count_documents({}, limit=1) == 0:
+        build_rollups(m, r)
+    elif loaded_dates:
+        build_rollups(m, r, min(loaded_dates), max(loaded_dates))
 
-        if mongo_empty:
-            m.insert_data(measurement_data, county_data)
+    if loaded_dates or counties_changed or redis_empty:
+        r.bump_data_version()
 
-        if redis_empty:
-            r.insert_data(station_data)
+    if parquet_root:
+        from parquet_store import ParquetStore
+        store = ParquetStore(parquet_root)
+        if full_reload:
+            shutil.rmtree(store.measurements_path, ignore_errors=True)
+        if loaded_dates or counties_changed or redis_empty or not store.has_measurements():
+            export_parquet(m, r, store, loaded_dates, stations_changed=counties_changed or redis_empty)
 
     a = AnalysisManager(m,r)
-    df = a.prepare_dataframe()
-    print(df)
+    if export_path:
+        a.export_dataframe(export_path)
+    else:
+        df = a.prepare_dataframe()
+        print(df)
 
 
 if __name__ == "__main__":
-    main(r'Dane/effacility.geojson', r'Dane/B00300S_2025_09.csv', r'Dane/powiaty.shp')
+    import argparse
+    from metrics import profile
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--full-reload', action='store_true', help='wczytaj wszystkie pomiary od nowa')
+    parser.add_argument('--parquet', metavar='KATALOG', help='zapisz tez kopie danych do Parquet w tym katalogu')
+    parser.add_argument('--export', metavar='PLIK', help='zapisz ramke pomiarow porcjami do .parquet albo .csv')
+    parser.add_argument('--schema', choices=MEASUREMENT_SCHEMAS, default='documents',
+                        help='zapis pomiarow: lista dokumentow albo spakowane 144 sloty float32')
+    parser.add_argument('--metrics', metavar='PLIK', help='zapisz metryki do pliku (.json albo .prom dla Prometheusa)')
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], help='uruchom pod profilerem')
+    parser.add_argument('--profile-output', metavar='PLIK', help='zapisz wynik profilera (.prof albo .html)')
+    args = parser.parse_args()
+
+    METRICS.enabled = bool(args.metrics)
+
+    def run():
+        main(r'Dane/effacility.geojson', r'Dane/B00*.csv', r'Dane/powiaty.shp', r'Dane/woj.shp',
+             full_reload=args.full_reload, schema=args.schema,
+             parquet_root=args.parquet, export_path=args.export)
+
+    if args.profile:
+        profile(run, args.profile, args.profile_output)
+    else:
+        run()
+
+    if args.metrics:
+        print(METRICS.summary())
+        if args.metrics.endswith('.prom'):
+            METRICS.to_prometheus(args.metrics)
+        else:
+            METRICS.to_json(args.metrics)
+        print(f'Metrics // Saved to {args.metrics}.')
 
 
 
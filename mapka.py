@@ -1,20 +1,28 @@
+import os
 import folium
-from shapely.geometry import shape
+from shapely.geometry import shape, mapping
+from metrics import timed
 
-def map_creator(analysis_result):
+def simplify_tolerance(zoom):
+    # ok. pol piksela na danym zoomie (256 px na 360 stopni przy zoomie 0)
+    return 180.0 / (256 * 2 ** zoom)
+
+@timed('map.map_creator')
+def map_creator(analysis_result, zoom_start=10, output='Wizualizacja.html'):
     lats = [s['geometry']['lat'] for s in analysis_result['stations']]
     lons = [s['geometry']['lon'] for s in analysis_result['stations']]
     center = [sum(lats) / len(lats), sum(lons) / len(lons)]
     
-    m = folium.Map(location=center, zoom_start=10)
+    m = folium.Map(location=center, zoom_start=zoom_start)
 
     all_day = [s['analysis']['avg_temp_day'] for s in analysis_result['stations']]
     all_night = [s['analysis']['avg_temp_night'] for s in analysis_result['stations']]
     
+    county_geometry = shape(analysis_result['county_geometry']).simplify(simplify_tolerance(zoom_start), preserve_topology=True)
     county_geojson = {
         'type': 'Feature',
-        'geometry': analysis_result['county_geometry'],
-        'properties': analysis_result['county']
+        'geometry': mapping(county_geometry),
+        'properties': {'name': analysis_result['county']['name']}
     }
     
     avg_day = sum(all_day) / len(all_day)
@@ -42,36 +50,31 @@ def map_creator(analysis_result):
         popup=folium.Popup(county_popup_html, max_width=300)
     ).add_to(m)
     
+    # jedna warstwa GeoJSON dla wszystkich stacji; popup z szablonu zamiast osobnego HTML na stacje
+    station_features = []
     for station in analysis_result['stations']:
         lat, lon = station['geometry']['lat'], station['geometry']['lon']
         analysis = station['analysis']
-        diff = analysis['avg_temp_day'] - analysis['avg_temp_night']
-        
-        popup_html = f"""
-        <div style="font-family: Arial; min-width: 250px; padding: 5px">
-            <h3 style="margin: 0 0 10px 0; color: #2c5aa0; border-bottom: 2px solid #2c5aa0; padding-bottom: 5px">
-                {station['name']}
-            </h3>
-            <p style="margin: 8px 0; color: #555">
-                <b>ID:</b> {station['station_id']}<br>
-                <b>Lokalizacja:</b> {lat:.4f}, {lon:.4f}
-            </p>
-            <h4 style="margin: 10px 0 5px 0; color: #2c5aa0">POMIARY</h4>
-            <p style="margin: 5px 0; line-height: 1.6">
-                <b>Średnia DZIEŃ:</b> {analysis['avg_temp_day']:.2f}°C <small style="color: #777">({analysis['day_measurements']} pom.)</small><br>
-                <b>Średnia NOC:</b> {analysis['avg_temp_night']:.2f}°C <small style="color: #777">({analysis['night_measurements']} pom.)</small><br>
-                <b>Różnica:</b> <span style="color: #d9534f; font-weight: bold">{diff:.2f}°C</span>
-            </p>
-        </div>"""
-        
-        folium.CircleMarker(
-            [lat, lon],
-            radius=8,
-            color='darkred',
-            fill_color='red',
-            fill_opacity=0.7,
-            popup=folium.Popup(popup_html, max_width=300)
-        ).add_to(m)
+        station_features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lon, 5), round(lat, 5)]},
+            'properties': {
+                'name': station['name'],
+                'station_id': station['station_id'],
+                'day': f"{analysis['avg_temp_day']:.2f}°C ({analysis['day_measurements']} pom.)",
+                'night': f"{analysis['avg_temp_night']:.2f}°C ({analysis['night_measurements']} pom.)",
+                'diff': round(analysis['avg_temp_day'] - analysis['avg_temp_night'], 2)
+            }
+        })
+
+    folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': station_features},
+        marker=folium.CircleMarker(radius=8, color='darkred', fill_color='red', fill_opacity=0.7),
+        popup=folium.GeoJsonPopup(fields=['name', 'station_id', 'day', 'night', 'diff'],
+                                  aliases=['Stacja', 'ID', 'Średnia DZIEŃ', 'Średnia NOC', 'Różnica [°C]']),
+        name='Stacje'
+    ).add_to(m)
     
-    m.save('Wizualizacja.html')
-    print(f"Mapa zapisana: {len(analysis_result['stations'])} stacji w powiecie {analysis_result['county']['name']}")
\ No newline at end of file
+    m.save(output)
+    size = os.path.getsize(output)
+    print(f"Mapa zapisana: {len(analysis_result['stations'])} stacji w powiecie {analysis_result['county']['name']} ({size / 1024:.0f} kB)")
@@ -0,0 +1,126 @@
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def record(self, name, seconds=0.0, calls=1, round_trips=0, bytes_out=0, bytes_in=0):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.entries.setdefault(name, {'calls': 0, 'seconds': 0.0, 'round_trips': 0,
+                                                   'bytes_out': 0, 'bytes_in': 0})
+            entry['calls'] += calls
+            entry['seconds'] += seconds
+            entry['round_trips'] += round_trips
+            entry['bytes_out'] += bytes_out
+            entry['bytes_in'] += bytes_in
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self.lock:
+            self.entries.clear()
+
+    def report(self):
+        with self.lock:
+            return {name: dict(entry, seconds=round(entry['seconds'], 6))
+                    for name, entry in sorted(self.entries.items())}
+
+    def to_json(self, path=None):
+        text = json.dumps(self.report(), indent=2)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self, path=None, prefix='pag'):
+        lines = []
+        fields = (('calls', 'counter', 'calls_total'), ('seconds', 'counter', 'seconds_total'),
+                  ('round_trips', 'counter', 'round_trips_total'), ('bytes_out', 'counter', 'bytes_out_total'),
+                  ('bytes_in', 'counter', 'bytes_in_total'))
+        report = self.report()
+        for field, kind, suffix in fields:
+            metric = f'{prefix}_{suffix}'
+            lines.append(f'# TYPE {metric} {kind}')
+            for name, entry in report.items():
+                label = name.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{metric}{{op="{label}"}} {entry[field]}')
+        text = '\n'.join(lines) + '\n'
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def summary(self, limit=15):
+        rows = sorted(self.report().items(), key=lambda item: item[1]['seconds'], reverse=True)[:limit]
+        lines = [f"{'operacja':<45} {'wywolania':>9} {'czas [s]':>10} {'round trips':>11} {'KB out':>9} {'KB in':>9}"]
+        for name, e in rows:
+            lines.append(f"{name:<45} {e['calls']:>9} {e['seconds']:>10.3f} {e['round_trips']:>11} "
+                         f"{e['bytes_out'] / 1024:>9.1f} {e['bytes_in'] / 1024:>9.1f}")
+        return '\n'.join(lines)
+
+
+METRICS = Metrics()
+timer = METRICS.timer
+timed = METRICS.timed
+
+
+
+def profile(func, mode='cprofile', output=None):
+    # cProfile ze standardowej biblioteki albo pyinstrument (opcjonalny, instalowany osobno)
+    if mode == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return func()
+        finally:
+            profiler.stop()
+            print(profiler.output_text(unicode=True, color=False))
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+                print(f'Profile // Saved to {output}.')
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        stats = pstats.Stats(profiler).sort_stats('cumulative')
+        stats.print_stats(25)
+        if output:
+            stats.dump_stats(output)
+            print(f'Profile // Saved to {output}.')
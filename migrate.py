@@ -0,0 +1,52 @@
+import sys
+import time
+import bson
+import pymongo
+from databases import (MEASUREMENT_SCHEMAS, MongoManager, RedisManager, build_rollups, decode_values,
+                       measurement_update)
+
+
+def migrate_measurements(mongo, redis, target='packed', batch_size=1000):
+    if target not in MEASUREMENT_SCHEMAS:
+        raise ValueError(f'Migrate // Unknown measurement schema: {target}.')
+
+    # dokumenty w starym schemacie, stronicowane po _id, zeby nie skanowac kolekcji w kazdej porcji
+    source = {'values': {'$exists': True}} if target == 'packed' else {'packed': {'$exists': True}}
+    start = time.perf_counter()
+    migrated, size_before, size_after = 0, 0, 0
+    last_id = None
+
+    while True:
+        query = dict(source, _id={'$gt': last_id}) if last_id is not None else source
+        docs = list(mongo.db.stacje.find(query).sort('_id', pymongo.ASCENDING).limit(batch_size))
+        if not docs:
+            break
+
+        batch = []
+        for doc in docs:
+            update = measurement_update(decode_values(doc), target)
+            migrated_doc = {k: v for k, v in doc.items() if k not in update['$unset']}
+            migrated_doc.update(update['$set'])
+
+            size_before += len(bson.encode(doc))
+            size_after += len(bson.encode(migrated_doc))
+            batch.append(pymongo.UpdateOne({'_id': doc['_id']}, update))
+
+        mongo.db.stacje.bulk_write(batch, ordered=False)
+        migrated += len(docs)
+        last_id = docs[-1]['_id']
+        print(f'Migrate // {migrated} documents converted to {target}.')
+
+    if migrated:
+        # float32 zmienia ostatnie cyfry wartosci, wiec dobowe i cache musza byc przeliczone od nowa
+        build_rollups(mongo, redis)
+        redis.bump_data_version()
+
+    elapsed = time.perf_counter() - start
+    print(f'Migrate // {migrated} documents in {elapsed:.2f}s, '
+          f'{size_before / 2 ** 20:.1f} MB -> {size_after / 2 ** 20:.1f} MB of BSON.')
+    return migrated
+
+
+if __name__ == "__main__":
+    migrate_measurements(MongoManager(), RedisManager(), sys.argv[1] if len(sys.argv) > 1 else 'packed')
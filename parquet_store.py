@@ -0,0 +1,166 @@
+import os
+import json
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from metrics import timed
+from databases import county_key
+
+PARQUET_ROOT = 'parquet'
+
+MEASUREMENT_SCHEMA = pa.schema([
+    ('station_id', pa.int64()),
+    ('m_type', pa.string()),
+    ('date', pa.date32()),
+    ('minute', pa.int16()),
+    ('value', pa.float64())
+])
+MEASUREMENT_COLUMNS = MEASUREMENT_SCHEMA.names
+MEASUREMENT_KEY = ['station_id', 'm_type', 'date']
+
+# wiersze posortowane po stacji, wiec statystyki grup wierszy pozwalaja pominac stacje spoza zapytania
+ROW_GROUP_ROWS = 64 * 1024
+
+
+def _columns(table):
+    return (table['station_id'].to_numpy(),
+            table['date'].to_numpy().astype('datetime64[D]'),
+            table['minute'].to_numpy(),
+            table['value'].to_numpy(),
+            table['m_type'].to_numpy(zero_copy_only=False).astype(object))
+
+
+def _date(value):
+    return pa.scalar(datetime.date.fromisoformat(str(value)[:10]), pa.date32())
+
+
+class ParquetStore:
+    # pomiary w partycjach miesiecznych (month=YYYY-MM), stacje i powiaty w osobnych plikach
+    def __init__(self, root=PARQUET_ROOT):
+        self.root = root
+        self.measurements_path = os.path.join(root, 'pomiary')
+        self.stations_path = os.path.join(root, 'stacje.parquet')
+        self.counties_path = os.path.join(root, 'powiaty.parquet')
+
+    def has_measurements(self):
+        return os.path.isdir(self.measurements_path) and any(os.scandir(self.measurements_path))
+
+    def has_stations(self):
+        return os.path.exists(self.stations_path) and os.path.exists(self.counties_path)
+
+    def _partition(self, month):
+        return os.path.join(self.measurements_path, f'month={month}', 'part-0.parquet')
+
+    @timed('parquet.write_measurements')
+    def write_measurements(self, station_ids, dates, minutes, values, m_types):
+        # dni juz zapisane w partycji sa nadpisywane, tak jak upsert w Mongo
+        frame = pd.DataFrame({
+            'station_id': np.asarray(station_ids, dtype=np.int64),
+            'm_type': np.asarray(m_types, dtype=object),
+            'date': np.asarray(dates, dtype='datetime64[D]'),
+            'minute': np.asarray(minutes, dtype=np.int16),
+            'value': np.asarray(values, dtype=np.float64)
+        })
+        months = frame['date'].dt.strftime('%Y-%m')
+
+        written = 0
+        for month, part in frame.groupby(months, sort=True):
+            path = self._partition(month)
+            if os.path.exists(path):
+                old = pq.read_table(path).to_pandas(date_as_object=False)
+                replaced = old.set_index(MEASUREMENT_KEY).index.isin(part.set_index(MEASUREMENT_KEY).index.unique())
+                part = pd.concat([old[~replaced], part], ignore_index=True)
+
+            # stabilne sortowanie zostawia pomiary dnia w kolejnosci z pliku, jak w dokumencie Mongo
+            part = part.sort_values(MEASUREMENT_KEY, kind='stable', ignore_index=True)
+            table = pa.Table.from_pandas(part, schema=MEASUREMENT_SCHEMA, preserve_index=False)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pq.write_table(table, path + '.tmp', row_group_size=ROW_GROUP_ROWS, compression='zstd')
+            os.replace(path + '.tmp', path)
+            written += len(part)
+
+        return written
+
+    def write_stations(self, stations, counties):
+        rows = [{
+            'station_id': int(s['properties']['ifcid']),
+            'lon': float(s['geometry']['coordinates'][0]),
+            'lat': float(s['geometry']['coordinates'][1]),
+            'county_id': county_key((s['properties'].get('powiatinfo') or {}).get('id')),
+            'properties': json.dumps(s['properties'], ensure_ascii=False)
+        } for s in stations if s['properties'].get('ifcid')]
+
+        county_rows = [{
+            'id': county_key(c['properties']['id']),
+            'name': c['properties']['name'],
+            'properties': json.dumps(c['properties'], ensure_ascii=False),
+            'geometry': json.dumps(c['geometry'])
+        } for c in counties]
+
+        os.makedirs(self.root, exist_ok=True)
+        pd.DataFrame(rows).sort_values('station_id').to_parquet(self.stations_path, index=False)
+        pd.DataFrame(county_rows).to_parquet(self.counties_path, index=False)
+        print(f'Parquet // {len(rows)} stations and {len(county_rows)} counties saved.')
+
+    def _scan(self, station_ids=None, start_date=None, end_date=None, m_types=None):
+        schema = pa.unify_schemas([MEASUREMENT_SCHEMA, pa.schema([('month', pa.string())])])
+        dataset = ds.dataset(self.measurements_path, schema=schema, format='parquet', partitioning='hive')
+
+        # filtr po month odcina cale partycje, filtry po stacji, parametrze i dacie schodza do grup wierszy
+        conditions = []
+        if station_ids is not None:
+            conditions.append(ds.field('station_id').isin(np.asarray(list(station_ids), dtype=np.int64)))
+        if m_types is not None:
+            conditions.append(ds.field('m_type').isin(list(m_types)))
+        if start_date:
+            conditions.append(ds.field('month') >= str(start_date)[:7])
+            conditions.append(ds.field('date') >= _date(start_date))
+        if end_date:
+            conditions.append(ds.field('month') <= str(end_date)[:7])
+            conditions.append(ds.field('date') <= _date(end_date))
+
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+        return dataset, condition
+
+    @timed('parquet.measurement_columns')
+    def measurement_columns(self, station_ids=None, start_date=None, end_date=None, m_types=None):
+        if not self.has_measurements():
+            return _columns(MEASUREMENT_SCHEMA.empty_table())
+
+        dataset, condition = self._scan(station_ids, start_date, end_date, m_types)
+        return _columns(dataset.to_table(columns=MEASUREMENT_COLUMNS, filter=condition))
+
+    def iter_measurement_columns(self, chunk_size, station_ids=None, start_date=None, end_date=None, m_types=None):
+        # chunk_size w dniach stacji, jak w MongoRedisBackend (144 pomiary na dzien)
+        if not self.has_measurements():
+            return
+
+        dataset, condition = self._scan(station_ids, start_date, end_date, m_types)
+        for batch in dataset.to_batches(columns=MEASUREMENT_COLUMNS, filter=condition, batch_size=chunk_size * 144):
+            if batch.num_rows:
+                yield _columns(pa.Table.from_batches([batch]))
+
+    def _stations(self, condition=None):
+        table = pq.read_table(self.stations_path, filters=condition)
+        return [{'type': 'Feature', 'properties': json.loads(p), 'geometry': {'type': 'Point', 'coordinates': [lon, lat]}}
+                for lon, lat, p in zip(table['lon'].to_pylist(), table['lat'].to_pylist(), table['properties'].to_pylist())]
+
+    def positions(self, station_ids=None):
+        condition = None if station_ids is None else [('station_id', 'in', [int(s) for s in station_ids])]
+        table = pq.read_table(self.stations_path, columns=['station_id', 'lon', 'lat'], filters=condition)
+        return {s_id: (lon, lat) for s_id, lon, lat in
+                zip(table['station_id'].to_pylist(), table['lon'].to_pylist(), table['lat'].to_pylist())}
+
+    def county_stations(self, county_name):
+        counties = pq.read_table(self.counties_path, filters=[('name', '==', county_name)]).to_pylist()
+        if not counties:
+            raise KeyError(f'Parquet // Unknown county: {county_name}.')
+
+        county = {'properties': json.loads(counties[0]['properties']), 'geometry': json.loads(counties[0]['geometry'])}
+        return county, self._stations([('county_id', '==', counties[0]['id'])])
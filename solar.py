@@ -0,0 +1,193 @@
+import datetime
+import numpy as np
+from zoneinfo import ZoneInfo
+from metrics import timed
+
+# astral: 90 + promien tarczy slonca, plus refrakcja liczona dla tego zenitu
+SUNRISE_ZENITH = 90.0 + 32.0 / (60.0 * 2.0)
+
+# granica dnia: wschod/zachod albo poczatek/koniec zmierzchu cywilnego (-6) i zeglarskiego (-12)
+DAY_VARIANTS = {
+    'sun': SUNRISE_ZENITH,
+    'civil': 96.0,
+    'nautical': 102.0
+}
+DEFAULT_VARIANT = 'sun'
+
+# czasy w plikach IMGW sa lokalne, razem ze zmiana czasu
+TIMEZONE = 'Europe/Warsaw'
+MINUTES_PER_DAY = 24 * 60
+
+
+def _refraction_at_zenith(zenith):
+    elevation = 90.0 - zenith
+    if elevation >= 85.0:
+        return 0.0
+
+    te = np.tan(np.radians(elevation))
+    if elevation > 5.0:
+        correction = 58.1 / te - 0.07 / te ** 3 + 0.000086 / te ** 5
+    elif elevation > -0.575:
+        correction = 1735.0 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711)))
+    else:
+        correction = -20.774 / te
+    return float(correction) / 3600.0
+
+
+def _declination_and_eq_of_time(jc):
+    l0 = (280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0
+    m = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+    c = (np.sin(m) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+         + np.sin(2.0 * m) * (0.019993 - 0.000101 * jc)
+         + np.sin(3.0 * m) * 0.000289)
+
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_long = np.radians(l0 + c - 0.00569 - 0.00478 * np.sin(omega))
+    seconds = 21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))
+    obliquity = np.radians(23.0 + (26.0 + seconds / 60.0) / 60.0 + 0.00256 * np.cos(omega))
+
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_long))
+
+    y = np.tan(obliquity / 2.0) ** 2
+    l0 = np.radians(l0)
+    eq_time = (y * np.sin(2.0 * l0)
+               - 2.0 * e * np.sin(m)
+               + 4.0 * e * y * np.sin(m) * np.cos(2.0 * l0)
+               - 0.5 * y * y * np.sin(4.0 * l0)
+               - 1.25 * e * e * np.sin(2.0 * m))
+
+    return declination, np.degrees(eq_time) * 4.0
+
+
+def _transit_minutes(lon, lat, jd, zenith, rising):
+    lat_rad = np.radians(np.clip(lat, -89.8, 89.8))
+    zenith_rad = np.radians(zenith + _refraction_at_zenith(zenith))
+
+    adjustment = 0.0
+    time_utc = h = None
+    for _ in range(2):
+        jc = (jd + adjustment - 2451545.0) / 36525.0
+        declination, eq_time = _declination_and_eq_of_time(jc)
+
+        h = (np.cos(zenith_rad) - np.sin(lat_rad) * np.sin(declination)) / (np.cos(lat_rad) * np.cos(declination))
+        hour_angle = np.degrees(np.arccos(np.clip(h, -1.0, 1.0)))
+        if not rising:
+            hour_angle = -hour_angle
+
+        offset = (-lon - hour_angle) * 4.0 - eq_time
+        offset = np.where(offset < -720.0, offset + 1440.0, offset)
+
+        time_utc = 720.0 + offset
+        adjustment = time_utc / 1440.0
+
+    # |h| > 1: slonce caly dzien powyzej (h < -1) albo ponizej (h > 1) granicy
+    return time_utc, h
+
+
+def utc_offset_minutes(dates, timezone=TIMEZONE):
+    # przesuniecie strefy w poludnie kazdego dnia - zmiana czasu jest w nocy, przed wschodem i po zachodzie
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    unique, inverse = np.unique(dates.ravel(), return_inverse=True)
+    zone = ZoneInfo(timezone)
+    minute = datetime.timedelta(minutes=1)
+    offsets = np.array([datetime.datetime.combine(d, datetime.time(12), zone).utcoffset() // minute
+                        for d in unique.tolist()], dtype=np.int16)
+    return offsets[inverse.ravel()].reshape(dates.shape)
+
+
+@timed('solar.sun_minutes')
+def sun_minutes(lon, lat, dates, zenith=SUNRISE_ZENITH, timezone=TIMEZONE):
+    # granice dnia w pelnych minutach od lokalnej polnocy (timezone=None - UTC): wschod zaokraglony w gore,
+    # zachod w dol, wiec pomiar z minuty m jest dzienny tylko gdy slonce jest juz/jeszcze nad granica
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    jd = dates.astype(np.int64) + 2440587.5
+
+    sunrise, h_rise = _transit_minutes(lon, lat, jd, zenith, rising=True)
+    sunset, h_set = _transit_minutes(lon, lat, jd, zenith, rising=False)
+    if timezone:
+        offset = utc_offset_minutes(dates, timezone)
+        sunrise, sunset = sunrise + offset, sunset + offset
+
+        # zdarzenie po lokalnej polnocy nalezy juz do nastepnego dnia - dla tego dnia bierzemy je z poprzedniej daty UTC
+        # (swit i zmierzch zeglarski latem na polnocy)
+        if np.any(sunrise >= MINUTES_PER_DAY):
+            earlier = _transit_minutes(lon, lat, jd - 1, zenith, rising=True)[0] + offset - MINUTES_PER_DAY
+            sunrise = np.where(sunrise >= MINUTES_PER_DAY, earlier, sunrise)
+        if np.any(sunset >= MINUTES_PER_DAY):
+            earlier = _transit_minutes(lon, lat, jd - 1, zenith, rising=False)[0] + offset - MINUTES_PER_DAY
+            sunset = np.where(sunset >= MINUTES_PER_DAY, earlier, sunset)
+
+    # granice zawsze w [0, 1440); sunrise > sunset - zmierzch po polnocy, noc to tylko okno (sunset, sunrise)
+    sunrise = np.ceil(np.mod(sunrise, MINUTES_PER_DAY))
+    sunset = np.floor(np.mod(sunset, MINUTES_PER_DAY))
+
+    always = (h_rise < -1.0) | (h_set < -1.0)
+    never = (h_rise > 1.0) | (h_set > 1.0)
+    sunrise = np.where(never, MINUTES_PER_DAY, np.where(always, 0, sunrise))
+    sunset = np.where(never, -1, np.where(always, MINUTES_PER_DAY - 1, sunset))
+    return sunrise.astype(np.int16), sunset.astype(np.int16)
+
+
+def day_mask(sunrise, sunset, minutes):
+    # dzien to [sunrise, sunset]; gdy zmierzch wypada po polnocy (sunrise > sunset) - wszystko poza (sunset, sunrise)
+    inside = (sunrise <= minutes) & (minutes <= sunset)
+    around = (sunrise <= minutes) | (minutes <= sunset)
+    return np.where(sunrise <= sunset, inside, around)
+
+
+@timed('solar.time_to_minutes')
+def time_to_minutes(times):
+    # 'HH:MM' -> minuty od polnocy, bez parsowania kazdej wartosci osobno
+    if len(times) == 0:
+        return np.empty(0, dtype=np.int16)
+    digits = np.asarray(times, dtype='S5').view(np.uint8).reshape(-1, 5).astype(np.int16) - ord('0')
+    return (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4]
+
+
+def date_range(start_date, end_date):
+    return np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+
+
+class SolarTable:
+    @timed('solar.SolarTable')
+    def __init__(self, positions, dates, variant=DEFAULT_VARIANT, timezone=TIMEZONE):
+        # positions: {station_id: (lon, lat)}, dates: 'YYYY-MM-DD' albo datetime64
+        if variant not in DAY_VARIANTS:
+            raise ValueError(f'Solar // Unknown day variant: {variant}.')
+        self.variant = variant
+        self.station_ids = np.array(sorted(positions), dtype=np.int64)
+        self.dates = np.unique(np.asarray(list(dates), dtype='datetime64[D]'))
+
+        coords = np.array([positions[s_id][:2] for s_id in self.station_ids], dtype=np.float64).reshape(-1, 2)
+        self.sunrise, self.sunset = sun_minutes(coords[:, 0:1], coords[:, 1:2], self.dates[np.newaxis, :],
+                                                DAY_VARIANTS[variant], timezone)
+
+    def __len__(self):
+        return self.sunrise.size
+
+    def station_index(self, station_ids):
+        station_ids = np.asarray(station_ids, dtype=np.int64)
+        idx = np.searchsorted(self.station_ids, station_ids)
+        idx[idx == len(self.station_ids)] = 0
+        if len(self.station_ids) and not np.array_equal(self.station_ids[idx], station_ids):
+            raise KeyError('Solar // Station missing from solar table.')
+        return idx
+
+    def date_index(self, dates):
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        idx = np.searchsorted(self.dates, dates)
+        idx[idx == len(self.dates)] = 0
+        if len(self.dates) and not np.array_equal(self.dates[idx], dates):
+            raise KeyError('Solar // Date missing from solar table.')
+        return idx
+
+    def bounds(self, station_ids, dates):
+        si, di = self.station_index(station_ids), self.date_index(dates)
+        return self.sunrise[si, di], self.sunset[si, di]
+
+    def is_day(self, station_ids, dates, minutes):
+        return day_mask(*self.bounds(station_ids, dates), minutes)
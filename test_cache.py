@@ -0,0 +1,40 @@
+from databases import *
+from benchmark import connect, load_synthetic
+from cache import AnalysisCache
+
+START, END = '2025-03-01', '2025-03-10'
+
+
+def test_cache_hits_and_invalidation():
+    m, r = connect('mock')
+    load_synthetic(m, r, 6, 1, '2025-03-01', grid=(2, 1))
+    build_rollups(m, r)
+    county = next(name for name, count in get_counties_with_station_count(m, r).items() if count > 0)
+    cache = AnalysisCache(m, r)
+
+    # pierwszy odczyt liczy, drugi z pamieci procesu, po wyczyszczeniu pamieci - z Redisa
+    result = cache.analyze(county, START, END)
+    assert result['stations'] == analyze_county_day_night(m, r, county, START, END, 'rollup')['stations']
+    assert cache.analyze(county, START, END) is result
+    cache.local.clear()
+    assert cache.analyze(county, START, END) == result
+    assert cache.stats == {'local_hits': 1, 'redis_hits': 1, 'misses': 1}
+
+    # tryb, parametry i granica dnia to osobne wpisy
+    keys = {cache.key(county, START, END),
+            cache.key(county, START, END, 'python'),
+            cache.key(county, START, END, 'python', ['B00300S', 'B00802A']),
+            cache.key(county, START, END, 'python', variant='civil')}
+    assert len(keys) == 4
+    cache.analyze(county, START, END, 'python')
+    assert cache.stats['misses'] == 2
+
+    # nowa wersja danych uniewaznia wszystkie wpisy
+    r.bump_data_version()
+    cache.analyze(county, START, END)
+    assert cache.stats['misses'] == 3
+
+
+if __name__ == "__main__":
+    test_cache_hits_and_invalidation()
+    print('Cache analiz dziala.')
@@ -4,20 +4,25 @@ m = MongoManager()
 r = RedisManager()
 
 # Przykład: Powiat pszczyński (ma dane w bazie)
-result = get_county_data(m, r, 'pszczyński', '2025-09-01', '2025-09-10')
+county = m.db.powiaty.find_one({'properties.name': 'pszczyński'}, {'_id': 0})
 
-if result:
-    print(f"Powiat: {result['county']['properties']['name']}")
-    print(f"Liczba stacji: {len(result['stations'])}")
-    print(f"Liczba pomiarów: {len(result['measurements'])}")
+if county:
+    stations = r.get_county_stations(county['properties']['id'])
+    s_ids = [s['properties']['ifcid'] for s in stations]
+    measurements = list(m.db.stacje.find(
+        {'station_id': {'$in': s_ids}, 'date': {'$gte': '2025-09-01', '$lte': '2025-09-10'}}, {'_id': 0}))
+
+    print(f"Powiat: {county['properties']['name']}")
+    print(f"Liczba stacji: {len(stations)}")
+    print(f"Liczba pomiarów: {len(measurements)}")
     
     print("\nStacje:")
-    for s in result['stations']:
+    for s in stations:
         print(f"  - {s['properties']['name1']} (ID: {s['properties']['ifcid']})")
     
     print("\nPrzykładowy pomiar:")
-    if result['measurements']:
-        m = result['measurements'][0]
-        print(f"  Stacja: {m['station_id']}, Data: {m['date']}, Wartości: {len(m['values'])}")
+    if measurements:
+        m = measurements[0]
+        print(f"  Stacja: {m['station_id']}, Data: {m['date']}, Wartości: {len(decode_values(m))}")
 else:
     print("Nie znaleziono powiatu")
@@ -0,0 +1,44 @@
+import math
+import fakeredis
+from databases import *
+
+
+def redis_manager():
+    # Redis w pamieci, zeby test nie nadpisywal indeksu stacji w prawdziwej bazie
+    return RedisManager(connection_class=getattr(fakeredis, 'FakeRedisConnection', fakeredis.FakeConnection),
+                        server=fakeredis.FakeServer())
+
+
+def joined_stations():
+    # tak jak po sjoin z how='left': id powiatu jako float, a stacja poza powiatami z NaN
+    stations = []
+    for i, county_id in enumerate([400.0, 400.0, 401.0, 1261.0, float('nan')]):
+        stations.append({'type': 'Feature',
+                         'properties': {'ifcid': 100_000 + i, 'name1': f'Stacja {i}',
+                                        'powiatinfo': {'nazwa': None if math.isnan(county_id) else f'powiat {county_id}',
+                                                       'id': county_id}},
+                         'geometry': {'type': 'Point', 'coordinates': [19.0 + i / 10, 52.0]}})
+    return stations
+
+
+def test_county_key_normalizes_ids():
+    assert county_key(400) == county_key(400.0) == county_key('400') == '400'
+    assert county_key(1261.0) == '1261'
+    assert county_key(float('nan')) is None and county_key(None) is None
+    assert county_key('c1') == 'c1'
+
+
+def test_county_index_uses_county_ids():
+    r = redis_manager()
+    r.insert_data(joined_stations())
+
+    assert r.db.smembers('counties') == {'400', '401', '1261'}
+    assert r.update_county_counts() == {'400': 2, '401': 1, '1261': 1}
+    # odczyt tym samym kluczem niezaleznie od tego, czy id przyszlo z powiaty (int), czy z sjoin (float)
+    assert r.get_county_station_ids(400) == r.get_county_station_ids(400.0) == [100000, 100001]
+
+
+if __name__ == "__main__":
+    test_county_key_normalizes_ids()
+    test_county_index_uses_county_ids()
+    print('Indeks powiatow zgodny z kolekcja powiaty.')
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import pytest
+from main import iter_csv_documents
+
+# dwie stacje na przemian w obrebie jednego dnia - tak jak po sklejeniu dwoch plikow IMGW
+ROWS = [
+    '249180010;B00300S;2025-09-01 00:00;10.0',
+    '249180010;B00300S;2025-09-01 00:10;11.0',
+    '250190390;B00300S;2025-09-01 00:00;20.0',
+    '250190390;B00300S;2025-09-01 00:10;21.0',
+    '249180010;B00300S;2025-09-01 00:20;12.0',
+    '250190390;B00300S;2025-09-01 00:20;22.0',
+]
+
+
+# stacje po kolei, ale malejaco po id - porcja nie moze byc sortowana przed wyborem grupy do przeniesienia
+DESCENDING = [f'{s_id};B00300S;2025-09-0{day} {hour:02d}:00;{hour}.0'
+              for s_id in (300000000, 200000000, 100000000) for day in (4, 5) for hour in range(24)]
+
+
+def write_csv(rows):
+    fd, path = tempfile.mkstemp(prefix='pag_csv_', suffix='.csv')
+    with os.fdopen(fd, 'w') as f:
+        f.write('\n'.join(rows) + '\n')
+    return path
+
+
+def interleaved_csv():
+    return write_csv(ROWS)
+
+
+def test_interleaved_rows_in_one_chunk_are_merged():
+    docs = list(iter_csv_documents(interleaved_csv()))
+    assert [(d['station_id'], d['date']) for d in docs] == [(249180010, '2025-09-01'), (250190390, '2025-09-01')]
+    assert [v['value'] for v in docs[0]['values']] == [10.0, 11.0, 12.0]
+    assert [v['time'] for v in docs[1]['values']] == ['00:00', '00:10', '00:20']
+
+
+def test_interleaved_rows_across_chunks_raise():
+    # grupa wydana w poprzedniej porcji nie moze zostac po cichu nadpisana
+    with pytest.raises(ValueError, match='not contiguous'):
+        list(iter_csv_documents(interleaved_csv(), chunksize=2))
+
+
+def test_descending_station_order_is_loaded():
+    # kolejnosc dokumentow zalezy od podzialu na porcje, wiec porownanie po kluczu
+    def documents(**kwargs):
+        return sorted(iter_csv_documents(path, **kwargs), key=lambda d: (d['station_id'], d['date']))
+
+    path = write_csv(DESCENDING)
+    expected = documents()
+    assert [(d['station_id'], d['date']) for d in expected] == [
+        (s_id, f'2025-09-0{day}') for s_id in (100000000, 200000000, 300000000) for day in (4, 5)]
+    assert all(len(d['values']) == 24 for d in expected)
+    for chunksize in (1, 5, 24, 25, 1000):
+        assert documents(chunksize=chunksize) == expected, chunksize
+
+
+if __name__ == "__main__":
+    test_interleaved_rows_in_one_chunk_are_merged()
+    test_interleaved_rows_across_chunks_raise()
+    test_descending_station_order_is_loaded()
+    print('Pliki CSV z przeplecionymi stacjami obsluzone.')
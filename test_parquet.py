@@ -0,0 +1,29 @@
+import tempfile
+from databases import *
+from benchmark import connect, load_synthetic
+from main import AnalysisManager, export_parquet
+from parquet_store import ParquetStore
+
+START, END = '2025-03-01', '2025-03-31'
+
+
+def test_parquet_matches_mongo():
+    # magazyn Parquet musi dawac dokladnie te same wyniki co Mongo i Redis (tu mongomock i fakeredis)
+    m, r = connect('mock')
+    load_synthetic(m, r, 8, 1, START, grid=(2, 2))
+    store = ParquetStore(tempfile.mkdtemp(prefix='pag_parquet_'))
+    export_parquet(m, r, store)
+    parquet = AnalysisManager(backend=store)
+
+    counties = [name for name, count in get_counties_with_station_count(m, r).items() if count > 0]
+    assert counties
+
+    for county in counties:
+        for start, end in ((START, END), (START, START), ('2025-03-28', '2025-03-31')):
+            raw = analyze_county_day_night(m, r, county, start, end)
+            assert parquet.analyze_county(county, start, end) == raw, (county, start, end)
+
+
+if __name__ == "__main__":
+    test_parquet_matches_mongo()
+    print('Parquet zgodny z Mongo i Redisem.')
@@ -0,0 +1,52 @@
+import functools
+from databases import *
+from benchmark import connect, load_synthetic
+
+# marzec 2025 - w zakresie jest zmiana czasu (30.03)
+START, END = '2025-03-01', '2025-03-31'
+
+
+@functools.lru_cache(maxsize=None)
+def database():
+    # mongomock i fakeredis z syntetycznymi stacjami, bez zywej bazy i plikow IMGW
+    m, r = connect('mock')
+    load_synthetic(m, r, 8, 1, START, grid=(2, 2))
+    build_rollups(m, r)
+    return m, r
+
+
+def test_rollup_matches_raw():
+    # dobowe musza dawac dokladnie te same wyniki co surowe pomiary
+    m, r = database()
+    counties = [name for name, count in get_counties_with_station_count(m, r).items() if count > 0]
+    assert counties
+
+    for county in counties:
+        for start, end in ((START, END), (START, START), ('2025-03-28', '2025-03-31')):
+            raw = analyze_county_day_night(m, r, county, start, end)
+            rolled = analyze_county_day_night(m, r, county, start, end, mode='rollup')
+            assert rolled['stations'] == raw['stations'], (county, start, end)
+
+
+def test_aggregate_matches_raw():
+    # mongo sumuje w innej kolejnosci, wiec srednie tylko z dokladnoscia do bledu zaokraglen;
+    # tydzien ze zmiana czasu, bo agregacja w mongomock jest wolna
+    m, r = database()
+    counties = [name for name, count in get_counties_with_station_count(m, r).items() if count > 0]
+
+    for county in counties:
+        raw = analyze_county_day_night(m, r, county, '2025-03-25', END)
+        server = analyze_county_day_night(m, r, county, '2025-03-25', END, mode='aggregate')
+        assert [s['station_id'] for s in server['stations']] == [s['station_id'] for s in raw['stations']], county
+
+        for a, b in zip(raw['stations'], server['stations']):
+            for field in ('day_measurements', 'night_measurements'):
+                assert a['analysis'][field] == b['analysis'][field], (county, a['station_id'], field)
+            for field in ('avg_temp_day', 'avg_temp_night'):
+                assert abs(a['analysis'][field] - b['analysis'][field]) < 1e-9, (county, a['station_id'], field)
+
+
+if __name__ == "__main__":
+    test_rollup_matches_raw()
+    test_aggregate_matches_raw()
+    print('Dobowe i agregacja zgodne z surowymi pomiarami.')
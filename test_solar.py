@@ -0,0 +1,46 @@
+import numpy as np
+from solar import *
+
+# Gdansk, okolice przesilenia letniego i obie zmiany czasu w 2025
+LON, LAT = 18.6, 54.5
+DATES = np.array(['2025-03-29', '2025-03-30', '2025-05-26', '2025-05-31',
+                  '2025-06-21', '2025-07-12', '2025-10-25', '2025-10-26'], dtype='datetime64[D]')
+
+
+def test_civil_and_nautical_bounds():
+    # czas lokalny: po zmianie czasu granice przesuwaja sie o godzine
+    sunrise, sunset = sun_minutes(LON, LAT, DATES, DAY_VARIANTS['civil'])
+    assert sunrise.tolist() == [289, 346, 213, 206, 193, 214, 417, 359]
+    assert sunset.tolist() == [1133, 1195, 1313, 1322, 1342, 1328, 1081, 1019]
+
+    # w czerwcu zmierzch zeglarski wypada po polnocy - wtedy sunset < sunrise
+    sunrise, sunset = sun_minutes(LON, LAT, DATES, DAY_VARIANTS['nautical'])
+    assert sunrise.tolist() == [245, 303, 131, 116, 59, 123, 375, 317]
+    assert sunset.tolist() == [1177, 1239, 1397, 1414, 36, 1417, 1123, 1061]
+
+
+def test_bounds_stay_within_day():
+    dates = date_range('2025-05-01', '2025-08-15')
+    for lat in (LAT, 60.0):
+        for variant, zenith in DAY_VARIANTS.items():
+            sunrise, sunset = sun_minutes(LON, lat, dates, zenith)
+            assert ((0 <= sunrise) & (sunrise < MINUTES_PER_DAY)).all(), (lat, variant)
+            assert ((0 <= sunset) & (sunset < MINUTES_PER_DAY)).all(), (lat, variant)
+
+    # na 60N slonce w czerwcu nie schodzi 12 stopni pod horyzont - caly dzien jest dniem
+    sunrise, sunset = sun_minutes(LON, 60.0, np.array(['2025-06-21'], dtype='datetime64[D]'), DAY_VARIANTS['nautical'])
+    assert (sunrise[0], sunset[0]) == (0, MINUTES_PER_DAY - 1)
+
+
+def test_day_mask_across_midnight():
+    minutes = np.array([0, 36, 37, 58, 59, 720, 1439])
+    assert day_mask(59, 36, minutes).tolist() == [True, True, False, False, True, True, True]
+    assert day_mask(300, 1200, minutes).tolist() == [False, False, False, False, False, True, False]
+    assert not day_mask(MINUTES_PER_DAY, -1, minutes).any()
+
+
+if __name__ == "__main__":
+    test_civil_and_nautical_bounds()
+    test_bounds_stay_within_day()
+    test_day_mask_across_midnight()
+    print('Granice dnia poprawne.')
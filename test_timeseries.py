@@ -0,0 +1,31 @@
+from databases import *
+from benchmark import connect, load_synthetic
+
+# tydzien ze zmiana czasu (30.03), agregacja w mongomock jest wolna
+START, END = '2025-03-27', '2025-04-02'
+
+
+def test_timeseries_modes_match():
+    # przedzialy liczone w numpy i w mongo musza byc takie same (tu mongomock i fakeredis)
+    m, r = connect('mock')
+    load_synthetic(m, r, 6, 2, '2025-03-01', grid=(2, 2))
+    counties = [name for name, count in get_counties_with_station_count(m, r).items() if count > 0]
+    assert counties
+
+    for county in counties:
+        for resolution in RESOLUTIONS:
+            local = county_timeseries(m, r, county, START, END, resolution)
+            server = county_timeseries(m, r, county, START, END, resolution, mode='aggregate')
+            assert local['stations'], (county, resolution)
+            assert local['stations'].keys() == server['stations'].keys(), (county, resolution)
+
+            for s_id, series in local['stations'].items():
+                other = server['stations'][s_id]
+                for field in ('time', 'min', 'max', 'count'):
+                    assert series[field] == other[field], (county, resolution, s_id, field)
+                assert all(abs(a - b) < 1e-9 for a, b in zip(series['mean'], other['mean'])), (county, resolution, s_id)
+
+
+if __name__ == "__main__":
+    test_timeseries_modes_match()
+    print('Szeregi czasowe zgodne w obu trybach.')